@@ -4,8 +4,12 @@ import re
 
 from agents.simplified_agent import SimplifiedAgent
 from tools.music_tools import generate_music, get_music_mood_preset
+from tools.batch_tools import generate_music_batch
 from tools.billing_tools import process_payment, check_subscription_status, list_all_customers
 from tools.marketing_tools import get_latest_music, create_music_sample, post_to_social_media
+from tools.analytics_tools import get_revenue_report, find_unpaid_customers
+from utils.singleflight import CoalescingLLM, FlightCancelled, get_flight_group
+from utils.deadline import Deadline, DeadlineExceeded, DEFAULT_REQUEST_TIMEOUT, current_deadline, deadline_scope
 
 
 class LangChainMultiAgentSystem:
@@ -13,24 +17,26 @@ class LangChainMultiAgentSystem:
     
     def __init__(self, api_key: str):
         """Initialize the multi-agent system"""
-        self.llm = ChatGoogleGenerativeAI(
+        # Shared by all agents; identical concurrent prompts share one Gemini call
+        self.llm = CoalescingLLM(ChatGoogleGenerativeAI(
             model="models/gemini-2.0-flash-exp",
             google_api_key=api_key,
             temperature=0
-        )
+        ))
+        self.classify_flight = get_flight_group("classify_request")
         
         # Create 3 specialized agents
         self.music_agent = SimplifiedAgent(
             "Music Producer",
-            "expert at generating AI music for various moods and styles",
-            [generate_music, get_music_mood_preset],
+            "expert at generating AI music for various moods and styles. Use generate_music_batch when asked for several tracks, variations or an album",
+            [generate_music, get_music_mood_preset, generate_music_batch],
             self.llm
         )
         
         self.billing_agent = SimplifiedAgent(
             "Finance Manager",
-            "expert at handling payments and subscription management",
-            [process_payment, check_subscription_status, list_all_customers],
+            "expert at handling payments, subscription management and revenue analytics",
+            [process_payment, check_subscription_status, list_all_customers, get_revenue_report, find_unpaid_customers],
             self.llm
         )
         
@@ -47,13 +53,22 @@ class LangChainMultiAgentSystem:
         print("Marketing Agent - Ready")
     
     def _classify_request(self, user_input: str) -> str:
+        """Use LLM to classify the request, coalescing identical concurrent inputs"""
+        key = " ".join(user_input.lower().split())
+        deadline = current_deadline()
+        return self.classify_flight.do(
+            key, self._classify_uncached, user_input,
+            cancel_event=deadline, timeout=deadline.timeout() if deadline else None
+        )
+    
+    def _classify_uncached(self, user_input: str) -> str:
         """Use LLM to classify the request into categories"""
         
         prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a request classifier. Analyze the user's request and respond with ONE word only.
 
 Categories:
-- "billing" → payments, fees, charges, subscriptions, customers, money, invoices, costs
+- "billing" → payments, fees, charges, subscriptions, customers, money, invoices, costs, revenue, churn
 - "music" → generating music, creating songs, composing, making tracks
 - "marketing" → social media, posting, sharing, promoting on Twitter/Instagram/Facebook
 - "other" → anything else (greetings, general questions, unrelated topics)
@@ -106,15 +121,30 @@ Respond with ONLY ONE WORD: billing, music, marketing, or other"""),
         return agent
     
     def invoke(self, input_dict: dict) -> dict:
-        """Process user input through the multi-agent system"""
+        """Process user input through the multi-agent system.
+        
+        input_dict keys:
+            input: The user request
+            timeout: Optional time limit in seconds (default: REQUEST_TIMEOUT_SECONDS)
+            deadline: Optional Deadline created by the caller, so it can cancel the request
+        """
         user_input = input_dict["input"]
+        deadline = input_dict.get("deadline") or Deadline(input_dict.get("timeout", DEFAULT_REQUEST_TIMEOUT))
         
+        with deadline_scope(deadline):
+            return self._invoke(user_input, deadline)
+    
+    def _invoke(self, user_input: str, deadline: Deadline) -> dict:
         print(f"\n{'='*70}")
         print(f"🤖 SUPERVISOR: Analyzing request...")
         print(f"{'='*70}\n")
         
         # Route to appropriate agent
-        agent = self._route_to_agent(user_input)
+        try:
+            agent = self._route_to_agent(user_input)
+        except (DeadlineExceeded, FlightCancelled):
+            print("SUPERVISOR: Request timed out or was cancelled during classification")
+            return {"output": "The request timed out before it could be handled. Please try again.", "timed_out": True}
         
         # Handle greeting
         if agent == "greeting":
@@ -139,13 +169,13 @@ Your question seems to be outside these areas. Is there something related to mus
         
         try:
             # Execute with the selected agent
-            output = agent.invoke(user_input)
+            output = agent.invoke(user_input, deadline)
             
             print(f"\n{'='*70}")
             print(f"SUPERVISOR: Task completed by {agent.name}")
             print(f"{'='*70}\n")
             
-            return {"output": output}
+            return {"output": output, "timed_out": deadline.is_set()}
             
         except Exception as e:
             error_msg = f"Error in {agent.name}: {str(e)}"
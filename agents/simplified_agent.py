@@ -1,6 +1,14 @@
 import json
+import time
 import re
 
+from utils.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from utils.tool_cache import invoke_tool, request_cache_scope
+
+# Initial guess for one LLM call + tool run, refined as iterations complete
+ITERATION_ESTIMATE_SECONDS = 5.0
+WRAP_UP_HINT = "Observation: Time is nearly up. Give your Final Answer now based on the results so far."
+
 class SimplifiedAgent:
     """A simplified agent that uses LLM with tools"""
     
@@ -10,7 +18,33 @@ class SimplifiedAgent:
         self.tools = {t.name: t for t in tools}
         self.llm = llm
         
-    def invoke(self, user_input: str) -> str:
+    def invoke(self, user_input: str, deadline: Deadline = None) -> str:
+        """Run the ReAct loop within the request deadline (no limit if none is given).
+        
+        Read-only tool results are reused for the rest of the request.
+        """
+        deadline = deadline or current_deadline() or Deadline()
+        with deadline_scope(deadline), request_cache_scope():
+            return self._run(user_input, deadline)
+    
+    def _iteration_budget(self, deadline: Deadline, max_iterations: int) -> int:
+        """Fewer iterations when the remaining time cannot fit the full loop"""
+        remaining = deadline.remaining()
+        if remaining is None:
+            return max_iterations
+        budget = max(1, min(max_iterations, int(remaining // ITERATION_ESTIMATE_SECONDS)))
+        if budget < max_iterations:
+            print(f"Deadline tight ({remaining:.0f}s left): limiting to {budget} iterations")
+        return budget
+    
+    def _partial_result(self, conversation: list, reason: str) -> str:
+        """Summarize the observations gathered before the request was cut short"""
+        observations = [c for c in conversation if c.startswith("Observation:") and c != WRAP_UP_HINT]
+        if not observations:
+            return f"Request stopped early ({reason}) before any step completed. Please try again."
+        return f"Request stopped early ({reason}). Partial results:\n" + "\n".join(observations)
+    
+    def _run(self, user_input: str, deadline: Deadline) -> str:
         tools_desc = "\n".join([f"- {name}: {tool.description}" for name, tool in self.tools.items()])
         
         prompt = f"""You are {self.name}, a {self.role}.
@@ -49,18 +83,40 @@ EXAMPLES OF CORRECT RESPONSES:
 
  Final Answer: Task completed successfully!"""
 
-        max_iterations = 10  # Increased for complex workflows
+        max_iterations = self._iteration_budget(deadline, 10)  # Increased for complex workflows
         conversation = []
+        started = None
+        # Per request: the agent is shared by concurrent requests with very different iteration costs
+        iteration_estimate = ITERATION_ESTIMATE_SECONDS
         
         for i in range(max_iterations):
             print(f"\n--- {self.name} Iteration {i+1} ---")
             
+            # Refine the per-iteration cost estimate from the previous iteration
+            if started is not None:
+                iteration_estimate = 0.7 * iteration_estimate + 0.3 * (time.monotonic() - started)
+            started = time.monotonic()
+            
+            if deadline.is_set():
+                print("Deadline reached - returning partial results")
+                return self._partial_result(conversation, deadline.reason or "time limit reached")
+            
+            # Ask for a wrap-up when this is likely the last iteration that fits
+            remaining = deadline.remaining()
+            tight = remaining is not None and (i == max_iterations - 1 or remaining < 2 * iteration_estimate)
+            if i > 0 and tight and WRAP_UP_HINT not in conversation:
+                conversation.append(WRAP_UP_HINT)
+            
             if conversation:
                 full_prompt = prompt + "\n\n" + "\n".join(conversation)
             else:
                 full_prompt = prompt
-                
-            response = self.llm.invoke(full_prompt).content
+            
+            try:
+                response = self.llm.invoke(full_prompt).content
+            except DeadlineExceeded as e:
+                print(f"Stopping: {e}")
+                return self._partial_result(conversation, str(e))
             
             print(f"\n{'─'*60}")
             print(f"RAW RESPONSE (Iteration {i+1}):")
@@ -159,11 +215,14 @@ EXAMPLES OF CORRECT RESPONSES:
                     
                     # Execute tool
                     if action in self.tools:
+                        if deadline.is_set():
+                            return self._partial_result(conversation, deadline.reason or "time limit reached")
+                        
                         print(f"Executing: {action}")
                         print(f"Input: {action_input}")
                         
                         try:
-                            result = self.tools[action].invoke(action_input)
+                            result = invoke_tool(self.tools[action], action_input)
                             print(f"Result: {result[:200]}...")
                             
                             observation = f"Observation: {result}"
@@ -191,4 +250,6 @@ EXAMPLES OF CORRECT RESPONSES:
                 return response
         
         print("Max iterations reached!")
+        if deadline.is_set():
+            return self._partial_result(conversation, deadline.reason or "time limit reached")
         return "Task incomplete - max iterations reached. Please simplify the request."
\ No newline at end of file
@@ -1,8 +1,18 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from agent_langchain import create_langchain_multiagent_system, load_database
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+import threading
+import json
+from utils.catalog import load_catalog
+from utils.audio_analysis import schedule_missing_analysis, peaks_path
+from utils.storage import resolve_track, storage_stats, start_compaction_thread
+from utils.singleflight import coalescing_stats
+from utils.tool_cache import cache_stats
+from utils.deadline import Deadline, DEFAULT_REQUEST_TIMEOUT, deadline_scope
+from tools.batch_tools import build_specs, run_batch
+from utils.analytics import revenue_between, revenue_series, customers_unpaid_since, month_range, parse_date
 
 load_dotenv()
 
@@ -18,6 +28,27 @@ print("\nInitializing LangChain Multi-Agent System...")
 agent_system = create_langchain_multiagent_system(api_key)
 print("System ready!\n")
 
+# Deadlines of in-flight chat requests, keyed by the client's request_id
+active_requests = {}
+active_requests_lock = threading.Lock()
+
+
+def run_agent(user_input: str, data: dict) -> dict:
+    """Invoke the agent system under a deadline the client can cancel"""
+    timeout = min(float(data.get('timeout') or DEFAULT_REQUEST_TIMEOUT), DEFAULT_REQUEST_TIMEOUT)
+    deadline = Deadline(timeout)
+    request_id = data.get('request_id')
+    
+    if request_id:
+        with active_requests_lock:
+            active_requests[request_id] = deadline
+    try:
+        return agent_system.invoke({"input": user_input, "deadline": deadline})
+    finally:
+        if request_id:
+            with active_requests_lock:
+                active_requests.pop(request_id, None)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -31,16 +62,67 @@ def chat():
         if not user_input:
             return jsonify({'error': 'No message provided'}), 400
         
-        result = agent_system.invoke({"input": user_input})
+        result = run_agent(user_input, data)
         
         return jsonify({
             'response': result['output'],
+            'timed_out': result.get('timed_out', False),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/cancel', methods=['POST'])
+def cancel_chat():
+    """Abandon an in-flight request (sent by the UI when the user leaves or aborts)"""
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        with active_requests_lock:
+            deadline = active_requests.get(data.get('request_id'))
+        
+        if deadline is None:
+            return jsonify({'cancelled': False})
+        
+        deadline.cancel("cancelled by client")
+        return jsonify({'cancelled': True})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/generate-batch', methods=['POST'])
+def generate_batch():
+    """Generate a batch/album in parallel, streaming one JSON line per finished track"""
+    try:
+        data = request.json or {}
+        specs = build_specs(
+            data.get('specs'), data.get('tags', ''), data.get('lyrics', ''),
+            data.get('variations', 0), data.get('duration', 15)
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    timeout = min(float(data.get('timeout') or DEFAULT_REQUEST_TIMEOUT), DEFAULT_REQUEST_TIMEOUT)
+    deadline = Deadline(timeout)
+    request_id = data.get('request_id')
+    
+    def stream():
+        if request_id:
+            with active_requests_lock:
+                active_requests[request_id] = deadline
+        try:
+            with deadline_scope(deadline):
+                for event in run_batch(specs, data.get('title', '')):
+                    yield json.dumps(event) + '\n'
+        finally:
+            # Also reached when the client disconnects mid-stream
+            deadline.cancel("stream closed")
+            if request_id:
+                with active_requests_lock:
+                    active_requests.pop(request_id, None)
+    
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
 @app.route('/api/customers', methods=['GET'])
 def get_customers():
     try:
@@ -69,19 +151,48 @@ def get_music_files():
         if not os.path.exists(music_dir):
             return jsonify({'files': []})
         
+        tracks = load_catalog()["tracks"]
+        
         files = []
         for filename in os.listdir(music_dir):
             if filename.endswith('.mp3') and '_sample_' not in filename:
                 filepath = os.path.join(music_dir, filename)
                 file_stat = os.stat(filepath)
+                analysis = tracks.get(filename, {}).get('analysis')
                 
                 files.append({
                     'name': filename,
                     'path': filepath,
                     'size': round(file_stat.st_size / 1024, 2),  # KB
-                    'created': datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    'created': datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                    'duration': analysis['duration'] if analysis else None,
+                    'bitrate': analysis['bitrate'] if analysis else None,
+                    'sample_rate': analysis['sample_rate'] if analysis else None,
+                    'loudness_db': analysis['loudness_db'] if analysis else None,
+                    'has_peaks': analysis is not None,
+                    'tier': 'hot'
+                })
+        
+        # Archived tracks are listed from the catalog (restored on play)
+        for filename, entry in tracks.items():
+            if entry.get('tier') == 'archive':
+                analysis = entry.get('analysis')
+                files.append({
+                    'name': filename,
+                    'path': os.path.join(music_dir, filename),
+                    'size': round(entry.get('size', 0) / 1024, 2),
+                    'created': datetime.fromtimestamp(entry.get('mtime', 0)).strftime('%Y-%m-%d %H:%M:%S'),
+                    'duration': analysis['duration'] if analysis else None,
+                    'bitrate': analysis['bitrate'] if analysis else None,
+                    'sample_rate': analysis['sample_rate'] if analysis else None,
+                    'loudness_db': analysis['loudness_db'] if analysis else None,
+                    'has_peaks': analysis is not None,
+                    'tier': 'archive'
                 })
         
+        # Analyze any new files in the background for the next refresh
+        schedule_missing_analysis([f['name'] for f in files if not f['has_peaks'] and f['tier'] == 'hot'])
+        
         # Sort by creation time, newest first
         files.sort(key=lambda x: x['created'], reverse=True)
         
@@ -95,18 +206,87 @@ def play_music():
     try:
         file_path = request.args.get('file', '')
         
-        if not file_path or not os.path.exists(file_path):
-            return jsonify({'error': 'File not found'}), 404
-        
         # Security check: ensure the file is in the generated_music directory
-        if not file_path.startswith('generated_music'):
+        if file_path and not file_path.startswith('generated_music'):
             return jsonify({'error': 'Invalid file path'}), 403
         
+        # Restores archived tracks and follows duplicate aliases
+        file_path = resolve_track(file_path) if file_path else file_path
+        
+        if not file_path or not os.path.exists(file_path):
+            return jsonify({'error': 'File not found'}), 404
+        
         return send_file(file_path, mimetype='audio/mpeg')
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/music-peaks', methods=['GET'])
+def get_music_peaks():
+    """Serve precomputed waveform peaks (one uint8 per bucket) for a track"""
+    try:
+        filename = os.path.basename(request.args.get('file', ''))
+        peaks_file = peaks_path(filename)
+        
+        if not filename or not os.path.exists(peaks_file):
+            return jsonify({'error': 'Waveform not ready'}), 404
+        
+        # send_file resolves relative paths against the app root, not the working directory
+        return send_file(os.path.abspath(peaks_file), mimetype='application/octet-stream', max_age=3600)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/storage', methods=['GET'])
+def get_storage_stats():
+    try:
+        return jsonify(storage_stats())
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics/revenue', methods=['GET'])
+def get_revenue():
+    try:
+        start = request.args.get('start', '')
+        end = request.args.get('end', '')
+        bucket = request.args.get('bucket', 'day')
+        
+        if bucket not in ('day', 'month'):
+            return jsonify({'error': 'bucket must be day or month'}), 400
+        
+        try:
+            start_ts = parse_date(start) if start else month_range()[0]
+            end_ts = parse_date(end, end_of_day=True) if end else datetime.now().timestamp()
+        except ValueError:
+            return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+        
+        return jsonify({
+            **revenue_between(start_ts, end_ts),
+            'series': revenue_series(start_ts, end_ts, bucket)
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics/unpaid', methods=['GET'])
+def get_unpaid_customers():
+    try:
+        days = request.args.get('days', 30, type=int)
+        return jsonify({'days': days, **customers_unpaid_since(days)})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/coalescing', methods=['GET'])
+def get_coalescing_stats():
+    """How many generation/LLM calls were served by another caller's in-flight request"""
+    try:
+        return jsonify({**coalescing_stats(), 'tool_cache': cache_stats()})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/quick-action', methods=['POST'])
 def quick_action():
     try:
@@ -124,10 +304,11 @@ def quick_action():
         if action not in actions:
             return jsonify({'error': 'Invalid action'}), 400
         
-        result = agent_system.invoke({"input": actions[action]})
+        result = run_agent(actions[action], data)
         
         return jsonify({
             'response': result['output'],
+            'timed_out': result.get('timed_out', False),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         })
     
@@ -135,4 +316,6 @@ def quick_action():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    schedule_missing_analysis()
+    start_compaction_thread()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
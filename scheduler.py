@@ -4,6 +4,8 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from agents.multi_agent_system import LangChainMultiAgentSystem
+from utils.storage import run_compaction
+from utils.leases import get_lease_backend, Lease, run_once
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +21,23 @@ print("API Key loaded successfully\n")
 # Initialize the multi-agent system using factory function
 agent_system = LangChainMultiAgentSystem(api_key)
 
+# Only the instance holding this lease runs jobs, so several schedulers can run for failover
+leader = Lease(get_lease_backend(), "scheduler")
+
+def every_seconds(seconds):
+    """Period key for interval jobs: the current slot of `seconds`"""
+    return lambda: str(int(time.time() // seconds))
+
+def calendar_month():
+    """Period key for monthly jobs"""
+    return datetime.now().strftime('%Y-%m')
+
+def leader_only(job, period):
+    """Run `job` on the lease holder only, at most once per period"""
+    def run():
+        run_once(leader, job.__name__, period(), job)
+    return run
+
 def daily_music_generation():
     """Generate music daily"""
     print(f"\n{'='*70}")
@@ -75,10 +94,25 @@ def monthly_billing():
     
     print(f"{'='*70}\n")
 
+def storage_compaction():
+    """Archive cold tracks, drop duplicates and stale samples"""
+    print(f"\n{'='*70}")
+    print(f"STORAGE COMPACTION - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*70}")
+    
+    try:
+        metrics = run_compaction()
+        print(f"\nResult: {metrics}")
+    except Exception as e:
+        print(f"Error: {e}")
+    
+    print(f"{'='*70}\n")
+
 # Schedule tasks
-#schedule.every(15).seconds.do(daily_music_generation)
-schedule.every(15).seconds.do(daily_marketing)
-#schedule.every(10).seconds.do(monthly_billing)
+#schedule.every(15).seconds.do(leader_only(daily_music_generation, every_seconds(15)))
+schedule.every(15).seconds.do(leader_only(daily_marketing, every_seconds(15)))
+#schedule.every(10).seconds.do(leader_only(monthly_billing, calendar_month))
+schedule.every().hour.do(leader_only(storage_compaction, every_seconds(3600)))
 
 print("\nSCHEDULER STARTED")
 print("="*70)
@@ -86,11 +120,15 @@ print("Schedule:")
 print("   - Music Generation: Every 15 seconds")
 print("   - Marketing: Every 25 seconds")
 print("   - Billing: Every 35 seconds")
+print("   - Storage Compaction: Every hour")
 print("="*70)
+print(f"Instance: {leader.owner}")
 print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 print("Press Ctrl+C to stop")
 print("="*70)
 
+leader.start()
+
 # Run scheduler
 try:
     while True:
@@ -98,6 +136,7 @@ try:
         time.sleep(1)
         
 except KeyboardInterrupt:
+    leader.stop()
     print("\n\nScheduler stopped by user")
     print(f"Stopped at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*70)
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Revenue rollups: incremental updates and catching up with the payment ledger
+"""
+import json
+
+import pytest
+
+from utils import analytics
+from tools.billing_tools import process_payment
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """Empty working directory with no database or rollups yet"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analytics, "_cache", {"mtime": None, "data": None, "index": None})
+    return tmp_path
+
+
+def _pay(name):
+    assert "Payment processed" in process_payment.invoke({"amount": 1.0, "customer_name": name, "new_customer": True})
+
+
+def _total_payments():
+    start, end = analytics.month_range()
+    return analytics.revenue_between(start, end)["payments"]
+
+
+def test_payments_are_folded_in_without_rebuilding(ledger, monkeypatch):
+    _pay("Alan")
+    assert _total_payments() == 1
+
+    def no_rebuild(db=None):
+        raise AssertionError("rollups rebuilt")
+    monkeypatch.setattr(analytics, "rebuild_rollups", no_rebuild)
+    _pay("Alan")
+    _pay("Maria")
+    assert _total_payments() == 3
+
+
+def test_rollups_catch_up_after_failed_update(ledger, monkeypatch):
+    _pay("Alan")
+
+    def failing(*args, **kwargs):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setattr("tools.billing_tools.record_payment", failing)
+        _pay("Maria")
+
+    assert _total_payments() == 2
+    with open(analytics.ANALYTICS_FILE) as f:
+        assert json.load(f)["ledger"]["payments"] == 2
+
+
+def test_payment_after_failed_update_rebuilds(ledger, monkeypatch):
+    _pay("Alan")
+    with monkeypatch.context() as patch:
+        patch.setattr("tools.billing_tools.record_payment", lambda *args: 1 / 0)
+        _pay("Maria")
+    _pay("John")
+
+    with open(analytics.ANALYTICS_FILE) as f:
+        rollups = json.load(f)
+    assert rollups["ledger"]["payments"] == 3
+    assert set(rollups["customers"]) == {"Alan", "Maria", "John"}
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Customer name matching: typo suggestions for short names, exact-only payment resolution
+"""
+import json
+
+import pytest
+
+from utils import customer_index
+from utils.customer_index import CustomerIndex
+from tools.billing_tools import process_payment
+
+NAMES = ["Alan", "John", "Bob Smith", "Maria Lopez"]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Empty working directory with a fresh customer database and index"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(customer_index, "_index", None)
+    with open("customer_database.json", "w") as f:
+        json.dump({"customers": {name: {"status": "active", "payments": []} for name in NAMES}}, f)
+    return tmp_path
+
+
+def _customers():
+    with open("customer_database.json") as f:
+        return json.load(f)["customers"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Alen", "Alan"),
+    ("Jon", "John"),
+    ("Bob Smiht", "Bob Smith"),
+    ("Maria Lopes", "Maria Lopez"),
+])
+def test_one_letter_typo_is_suggested(query, expected):
+    lookup = CustomerIndex(NAMES).lookup(query)
+    assert lookup["candidates"][0][0] == expected
+
+
+def test_normalized_variant_is_an_exact_match():
+    lookup = CustomerIndex(NAMES).lookup("  alan ")
+    assert lookup["match"] == "Alan" and lookup["confidence"] == 1.0
+
+
+def test_unrelated_name_has_no_candidates():
+    assert CustomerIndex(NAMES).lookup("Xavier")["candidates"] == []
+
+
+def test_payment_for_typo_is_refused_with_suggestion(database):
+    result = process_payment.invoke({"amount": 1.0, "customer_name": "Alen"})
+
+    assert "not found" in result and "Alan" in result
+    customers = _customers()
+    assert "Alen" not in customers
+    assert customers["Alan"]["payments"] == []
+
+
+def test_payment_resolves_only_exact_matches(database):
+    result = process_payment.invoke({"amount": 1.0, "customer_name": "alan"})
+
+    assert "Payment processed for Alan" in result
+    customers = _customers()
+    assert set(customers) == set(NAMES)
+    assert len(customers["Alan"]["payments"]) == 1
+
+
+def test_new_customer_overrides_suggestions(database):
+    result = process_payment.invoke({"amount": 1.0, "customer_name": "Alen", "new_customer": True})
+
+    assert "Payment processed for Alen" in result
+    customers = _customers()
+    assert len(customers["Alen"]["payments"]) == 1
+    assert customers["Alan"]["payments"] == []
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Scheduler leases across processes: crash and takeover, run-once claims, bounded history
+"""
+import multiprocessing
+import sqlite3
+import json
+import time
+import os
+
+import pytest
+
+from utils.leases import get_lease_backend, Lease, run_once
+
+TTL = 1.0
+BACKENDS = ["sqlite", "file"]
+
+
+def _backend_path(tmp_path, kind):
+    return str(tmp_path / ("leases.db" if kind == "sqlite" else "leases.json"))
+
+
+def _record(log_path, owner, job, period):
+    with open(log_path, "a") as f:
+        f.write(f"{owner} {job} {period}\n")
+
+
+def _read_runs(log_path):
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path) as f:
+        return [tuple(line.split()) for line in f]
+
+
+def _crashing_instance(kind, path, log_path, result_path):
+    """Take the lease, run jobs, then die without releasing it"""
+    lease = Lease(get_lease_backend(kind, path), "scheduler", ttl=TTL, owner="A")
+    acquire_started = time.time()
+    if not lease.acquire():
+        os._exit(2)
+    with open(result_path, "w") as f:
+        json.dump({"acquire_started": acquire_started}, f)
+    run_once(lease, "billing", "2026-10", _record, log_path, "A", "billing", "2026-10")
+    run_once(lease, "marketing", "slot-1", _record, log_path, "A", "marketing", "slot-1")
+    os._exit(1)
+
+
+def _standby_instance(kind, path, log_path, result_path):
+    """Wait for the crashed holder's lease to expire, then take over"""
+    lease = Lease(get_lease_backend(kind, path), "scheduler", ttl=TTL, owner="B")
+    deadline = time.monotonic() + 10 * TTL
+    while not lease.acquire():
+        if time.monotonic() > deadline:
+            os._exit(2)
+        time.sleep(0.05)
+    acquired_at = time.time()
+
+    for period in ("slot-1", "slot-2"):
+        run_once(lease, "marketing", period, _record, log_path, "B", "marketing", period)
+    run_once(lease, "billing", "2026-10", _record, log_path, "B", "billing", "2026-10")
+    lease.stop()
+    with open(result_path, "w") as f:
+        json.dump({"acquired_at": acquired_at}, f)
+
+
+def _campaigning_instance(kind, path, log_path, owner, crash_after, run_for):
+    """Run a scheduler-like loop; optionally crash partway through"""
+    lease = Lease(get_lease_backend(kind, path), "scheduler", ttl=TTL, owner=owner).start()
+    started = time.monotonic()
+    while time.monotonic() - started < run_for:
+        period = str(int(time.time() // 0.2))
+        run_once(lease, "tick", period, _record, log_path, owner, "tick", period)
+        run_once(lease, "billing", "2026-10", _record, log_path, owner, "billing", "2026-10")
+        if crash_after and time.monotonic() - started > crash_after:
+            os._exit(1)
+        time.sleep(0.02)
+    lease.stop()
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_lease_taken_over_after_holder_crashes(tmp_path, kind):
+    ctx = multiprocessing.get_context("spawn")
+    path = _backend_path(tmp_path, kind)
+    log_path = str(tmp_path / "runs.log")
+
+    crashed = ctx.Process(target=_crashing_instance, args=(kind, path, log_path, str(tmp_path / "a.json")))
+    crashed.start()
+    crashed.join(30)
+    assert crashed.exitcode == 1
+
+    standby = ctx.Process(target=_standby_instance, args=(kind, path, log_path, str(tmp_path / "b.json")))
+    standby.start()
+    standby.join(30)
+    assert standby.exitcode == 0
+
+    with open(tmp_path / "a.json") as f:
+        crash = json.load(f)
+    with open(tmp_path / "b.json") as f:
+        takeover = json.load(f)
+    # The crashed holder never released: the standby only got in once the TTL ran out
+    assert takeover["acquired_at"] >= crash["acquire_started"] + TTL
+
+    assert sorted(_read_runs(log_path)) == [
+        ("A", "billing", "2026-10"),
+        ("A", "marketing", "slot-1"),
+        ("B", "marketing", "slot-2"),
+    ]
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_each_period_runs_once_across_instances(tmp_path, kind):
+    ctx = multiprocessing.get_context("spawn")
+    path = _backend_path(tmp_path, kind)
+    log_path = str(tmp_path / "runs.log")
+    get_lease_backend(kind, path)  # create the store before the instances race for it
+
+    instances = [
+        ctx.Process(target=_campaigning_instance, args=(kind, path, log_path, "A", 1.0, 4.0)),
+        ctx.Process(target=_campaigning_instance, args=(kind, path, log_path, "B", 0, 4.0)),
+        ctx.Process(target=_campaigning_instance, args=(kind, path, log_path, "C", 0, 4.0)),
+    ]
+    for instance in instances:
+        instance.start()
+    for instance in instances:
+        instance.join(30)
+    assert [i.exitcode for i in instances] == [1, 0, 0]
+
+    runs = _read_runs(log_path)
+    keys = [(job, period) for _, job, period in runs]
+    assert len(keys) == len(set(keys))
+    assert keys.count(("billing", "2026-10")) == 1
+    # Someone other than the crashed instance kept the ticks going
+    assert {owner for owner, job, _ in runs if job == "tick"} - {"A"}
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+def test_run_history_keeps_only_latest_period(tmp_path, kind):
+    path = _backend_path(tmp_path, kind)
+    backend = get_lease_backend(kind, path)
+
+    for slot in range(50):
+        assert backend.claim_run("tick", str(slot), "A")
+        backend.finish_run("tick", str(slot), "done")
+    assert backend.claim_run("billing", "2026-10", "A")
+    assert not backend.claim_run("billing", "2026-10", "B")
+    assert not backend.claim_run("tick", "49", "B")
+
+    if kind == "sqlite":
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT job, period FROM runs ORDER BY job").fetchall()
+        conn.close()
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        rows = sorted((job, period) for job, periods in data["runs"].items() for period in periods)
+    assert rows == [("billing", "2026-10"), ("tick", "49")]
\ No newline at end of file
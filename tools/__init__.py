@@ -2,14 +2,19 @@
 from .music_tools import generate_music, get_music_mood_preset
 from .billing_tools import process_payment, check_subscription_status, list_all_customers
 from .marketing_tools import get_latest_music, create_music_sample, post_to_social_media
+from .analytics_tools import get_revenue_report, find_unpaid_customers
+from .batch_tools import generate_music_batch
 
 __all__ = [
     'generate_music',
     'get_music_mood_preset',
+    'generate_music_batch',
     'process_payment',
     'check_subscription_status',
     'list_all_customers',
     'get_latest_music',
     'create_music_sample',
     'post_to_social_media',
+    'get_revenue_report',
+    'find_unpaid_customers',
 ]
\ No newline at end of file
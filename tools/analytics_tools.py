@@ -0,0 +1,55 @@
+"""
+Billing analytics tools for the Billing Agent
+"""
+from langchain_core.tools import tool
+from datetime import datetime
+import json
+
+from utils.tool_cache import read_only
+from utils.analytics import revenue_between, revenue_series, customers_unpaid_since, month_range, parse_date
+
+
+@read_only("customers")
+@tool
+def get_revenue_report(start_date: str = "", end_date: str = "") -> str:
+    """Reports revenue and payment counts for a date range from precomputed rollups.
+
+    Args:
+        start_date: First day in YYYY-MM-DD format (default: first day of this month)
+        end_date: Last day in YYYY-MM-DD format (default: today)
+
+    Returns:
+        Total revenue, payment count and a per-day breakdown
+    """
+    print("Querying revenue rollups...")
+
+    try:
+        start_ts = parse_date(start_date) if start_date else month_range()[0]
+        end_ts = parse_date(end_date, end_of_day=True) if end_date else datetime.now().timestamp()
+    except ValueError:
+        return "Invalid date. Use YYYY-MM-DD format."
+
+    totals = revenue_between(start_ts, end_ts)
+    series = revenue_series(start_ts, end_ts)
+
+    result = f"Revenue {totals['start']} to {totals['end']}: ${totals['revenue']:.2f} from {totals['payments']} payments\n"
+    for point in series:
+        result += f"   {point['period']}: ${point['revenue']:.2f} ({point['payments']} payments, {point['customers']} customers)\n"
+
+    return result
+
+
+@read_only("customers")
+@tool
+def find_unpaid_customers(days: int = 30) -> str:
+    """Finds customers who have not paid in the given number of days (churned or never paid).
+
+    Args:
+        days: Days since last payment (default: 30)
+
+    Returns:
+        JSON with 'churned' (paid before, lapsed) and 'never_paid' customer lists
+    """
+    print(f"Finding customers unpaid for {days} days...")
+
+    return json.dumps(customers_unpaid_since(int(days)), indent=2)
\ No newline at end of file
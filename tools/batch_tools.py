@@ -0,0 +1,137 @@
+"""
+Batch and album generation for the Music Agent
+"""
+from langchain_core.tools import tool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import contextvars
+import random
+import json
+import os
+
+from tools.music_tools import generate_track, GENERATION_CONCURRENCY
+from utils.catalog import update_group, update_track
+from utils.deadline import DeadlineExceeded
+from utils.singleflight import FlightCancelled
+from utils.tool_cache import writes
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10"))
+
+
+def build_specs(specs=None, tags: str = "", lyrics: str = "", variations: int = 0, duration: int = 15) -> list:
+    """Normalize a batch request into a list of track specs.
+
+    Either pass `specs` (list of dicts with tags, lyrics, optional duration and
+    seed) or tags/lyrics with `variations` to get N seeded variations.
+
+    Raises:
+        ValueError on an empty, oversized, duplicated or malformed request
+    """
+    # Check the size before building anything (variations is client-controlled)
+    count = len(specs) if specs else int(variations or 0)
+    if count > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch too large ({count} tracks, max {MAX_BATCH_SIZE})")
+
+    if specs:
+        normalized = []
+        for spec in specs:
+            if not spec.get("tags"):
+                raise ValueError("Every spec needs 'tags'")
+            seed = spec.get("seed")
+            normalized.append({
+                "tags": spec["tags"],
+                "lyrics": spec.get("lyrics", ""),
+                "duration": int(spec.get("duration", duration)),
+                "seed": int(seed) if seed is not None else random.randint(0, 2**31 - 1),
+            })
+    elif tags and count > 0:
+        seeds = random.sample(range(2**31 - 1), count)
+        normalized = [{"tags": tags, "lyrics": lyrics, "duration": int(duration), "seed": seed} for seed in seeds]
+    else:
+        raise ValueError("Provide a list of specs, or tags with a number of variations")
+
+    # Identical specs would share one generation and one file
+    keys = [(s["tags"], s["lyrics"], s["duration"], s["seed"]) for s in normalized]
+    if len(set(keys)) != len(keys):
+        raise ValueError("Duplicate specs (same tags, lyrics, duration and seed); change the seed or drop one")
+    return normalized
+
+
+def run_batch(specs: list, title: str = ""):
+    """Generate all specs in parallel (bounded by the backend limit).
+
+    Yields one event per track as it completes, then a final summary event.
+    Successful tracks are recorded as one grouped catalog entry.
+    """
+    group_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{random.randrange(16**4):04x}"
+    update_group(group_id, title=title or group_id, specs=specs, tracks=[], status="running",
+                 created=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    print(f"Batch {group_id}: {len(specs)} tracks, {GENERATION_CONCURRENCY} at a time")
+
+    tracks, failed = [], 0
+    with ThreadPoolExecutor(max_workers=min(len(specs), GENERATION_CONCURRENCY)) as pool:
+        # Each worker inherits the request deadline through a copied context
+        futures = {
+            pool.submit(contextvars.copy_context().run, generate_track,
+                        spec["tags"], spec["lyrics"], spec["duration"], spec["seed"]): index
+            for index, spec in enumerate(specs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                path = future.result()
+            except (DeadlineExceeded, FlightCancelled):
+                failed += 1
+                yield {"event": "track", "index": index, "status": "cancelled"}
+                continue
+            except Exception as e:
+                failed += 1
+                yield {"event": "track", "index": index, "status": "error", "error": str(e)[:200]}
+                continue
+
+            name = os.path.basename(path)
+            tracks.append({"index": index, "name": name, "path": path, "seed": specs[index]["seed"]})
+            update_track(name, group=group_id, seed=specs[index]["seed"])
+            update_group(group_id, tracks=sorted(tracks, key=lambda t: t["index"]))
+            yield {"event": "track", "index": index, "status": "ok", "path": path, "seed": specs[index]["seed"]}
+
+    status = "complete" if not failed else ("failed" if not tracks else "partial")
+    update_group(group_id, status=status)
+    yield {"event": "done", "group_id": group_id, "status": status, "completed": len(tracks), "failed": failed}
+
+
+@writes("music")
+@tool
+def generate_music_batch(tags: str = "", lyrics: str = "", variations: int = 3, duration: int = 15, specs: str = "", title: str = "") -> str:
+    """Generates several tracks in parallel as one album/batch.
+
+    Args:
+        tags: Music style descriptors used for every variation
+        lyrics: Song lyrics used for every variation
+        variations: Number of seeded variations of tags/lyrics (default: 3)
+        duration: Duration of each track in seconds (default: 15)
+        specs: Optional JSON list of {"tags", "lyrics", "duration", "seed"} for distinct tracks (overrides tags/variations)
+        title: Optional album title
+
+    Returns:
+        Paths of the generated tracks and the album/batch id
+    """
+    print(f"Starting batch generation...")
+
+    try:
+        track_specs = build_specs(json.loads(specs) if specs else None, tags, lyrics, variations, duration)
+    except (ValueError, TypeError, AttributeError) as e:
+        return f"Invalid batch request: {e}"
+
+    lines = []
+    summary = {}
+    for event in run_batch(track_specs, title):
+        if event["event"] == "done":
+            summary = event
+        elif event["status"] == "ok":
+            lines.append((event["index"], f"- Track {event['index'] + 1}: {event['path']} (seed {event['seed']})"))
+        else:
+            lines.append((event["index"], f"- Track {event['index'] + 1}: {event['status']} {event.get('error', '')}".rstrip()))
+
+    lines.sort()
+    return f"Batch {summary['group_id']} {summary['status']}: {summary['completed']}/{len(track_specs)} tracks\n" + "\n".join(line for _, line in lines)
\ No newline at end of file
@@ -4,15 +4,30 @@ Billing and subscription management tools for the Billing Agent
 from langchain_core.tools import tool
 from datetime import datetime
 from utils.database import load_database, save_database
+from utils.analytics import record_payment
+from utils.customer_index import get_customer_index, index_customer
+from utils.tool_cache import read_only, writes
 
 
+def _suggestions(candidates: list) -> str:
+    return ", ".join(f"{name} ({score:.0%} match)" for name, score in candidates)
+
+
+def _match_note(requested: str, lookup: dict) -> str:
+    if lookup["confidence"] == 1.0:
+        return ""
+    return f"\n- Matched '{requested}' to existing customer '{lookup['match']}' (confidence {lookup['confidence']:.2f})"
+
+
+@writes("customers")
 @tool
-def process_payment(amount: float, customer_name: str) -> str:
+def process_payment(amount: float, customer_name: str, new_customer: bool = False) -> str:
     """Processes monthly payment and updates customer database.
     
     Args:
         amount: Payment amount (must be 1.0 for $1/month subscription)
         customer_name: Full name of the customer
+        new_customer: Set to true to create a new customer even if a similar name exists (default: false)
     
     Returns:
         Payment confirmation with details
@@ -22,30 +37,51 @@ def process_payment(amount: float, customer_name: str) -> str:
     if amount != 1.0:
         return f"Invalid amount. Subscription is $1/month (received: ${amount})"
     
+    # Only case/spacing/accent variants resolve automatically: a fuzzy match could
+    # credit another customer's account, so those are offered as suggestions
+    lookup = get_customer_index().lookup(customer_name)
+    if lookup["confidence"] == 1.0:
+        customer_name = lookup["match"]
+    elif lookup["candidates"] and not new_customer:
+        return (f"Customer '{customer_name}' not found. Did you mean: {_suggestions(lookup['candidates'])}?\n"
+                f"Use the exact existing name, or set new_customer to true to create a new customer.")
+    
     db = load_database()
     now = datetime.now()
     payment_id = f"PAY_{now.strftime('%Y%m%d%H%M%S')}"
     
-    if customer_name not in db["customers"]:
+    is_new = customer_name not in db["customers"]
+    if is_new:
         db["customers"][customer_name] = {
             "status": "active",
             "payments": [],
-            "created_at": now.strftime('%Y-%m-%d %H:%M:%S')
+            "created_at": now.strftime('%Y-%m-%d %H:%M:%S'),
+            "created_at_ts": now.timestamp()
         }
     
     db["customers"][customer_name]["payments"].append({
         "amount": amount,
         "payment_id": payment_id,
-        "timestamp": now.strftime('%Y-%m-%d %H:%M:%S')
+        "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
+        "ts": now.timestamp()
     })
     db["customers"][customer_name]["status"] = "active"
     db["customers"][customer_name]["last_payment"] = now.strftime('%Y-%m-%d %H:%M:%S')
     
     save_database(db)
+    index_customer(customer_name)
+    
+    try:
+        ledger_payments = sum(len(data.get("payments", [])) for data in db["customers"].values())
+        record_payment(customer_name, amount, now.timestamp(), ledger_payments)
+    except Exception as e:
+        # The rollups' ledger watermark is now behind, so they are rebuilt on the next read
+        print(f"Analytics update failed: {e}")
     
     return f"Payment processed for {customer_name}!\n- Amount: ${amount}\n- Payment ID: {payment_id}\n- Status: Active"
 
 
+@read_only("customers")
 @tool
 def check_subscription_status(customer_name: str) -> str:
     """Checks real subscription status from database.
@@ -58,22 +94,28 @@ def check_subscription_status(customer_name: str) -> str:
     """
     print("Checking subscription...")
     
-    db = load_database()
-    
-    if customer_name not in db["customers"]:
+    lookup = get_customer_index().lookup(customer_name)
+    if not lookup["match"]:
+        if lookup["candidates"]:
+            return f"Customer '{customer_name}' not found. Did you mean: {_suggestions(lookup['candidates'])}?"
         return f"Customer '{customer_name}' not found in system.\nPlease process payment first to activate subscription."
     
+    note = _match_note(customer_name, lookup)
+    customer_name = lookup["match"]
+    
+    db = load_database()
     customer = db["customers"][customer_name]
     status = customer.get("status", "inactive")
     payment_count = len(customer.get("payments", []))
     last_payment = customer.get("last_payment", "Never")
     
     if status == "active":
-        return f"{customer_name}: Active subscription\n- Plan: $1/month\n- Total payments: {payment_count}\n- Last payment: {last_payment}"
+        return f"{customer_name}: Active subscription\n- Plan: $1/month\n- Total payments: {payment_count}\n- Last payment: {last_payment}{note}"
     else:
-        return f"{customer_name}: Inactive subscription\n- Total payments: {payment_count}\n- Status: Payment required"
+        return f"{customer_name}: Inactive subscription\n- Total payments: {payment_count}\n- Status: Payment required{note}"
 
 
+@read_only("customers")
 @tool
 def list_all_customers() -> str:
     """Lists all customers in the database with their status.
@@ -6,7 +6,16 @@ from datetime import datetime
 import shutil
 import os
 
+from utils.audio_derivatives import PLATFORM_PRESETS, get_derivative, find_derivative, sample_preset
+from utils.ffmpeg import ffmpeg_available
+from utils.storage import resolve_track
+from utils.deadline import current_deadline
+from utils.tool_cache import read_only, writes
 
+SAMPLE_TIMEOUT = 120
+
+
+@read_only("music")
 @tool
 def get_latest_music() -> str:
     """Gets the latest generated music file path.
@@ -31,6 +40,7 @@ def get_latest_music() -> str:
     return f"Latest music file: {latest_file}"
 
 
+@writes("music")
 @tool
 def create_music_sample(music_file: str, duration: int = 30) -> str:
     """Creates preview sample from a music file.
@@ -44,17 +54,30 @@ def create_music_sample(music_file: str, duration: int = 30) -> str:
     """
     print("Creating sample...")
     
+    music_file = resolve_track(music_file)
     if not os.path.exists(music_file):
         return f"Music file not found: {music_file}"
     
-    sample_path = music_file.replace('.mp3', f'_sample_{duration}s.mp3')
-    
-    # Simulate sample creation (in real app, use audio processing)
-    shutil.copy(music_file, sample_path)
+    if not ffmpeg_available():
+        # Without ffmpeg, fall back to simulating the sample with a plain copy
+        sample_path = music_file.replace('.mp3', f'_sample_{duration}s.mp3')
+        shutil.copy(music_file, sample_path)
+        return f"Sample created: {sample_path} ({duration} seconds)"
+    
+    deadline = current_deadline()
+    timeout = deadline.timeout(SAMPLE_TIMEOUT) if deadline else SAMPLE_TIMEOUT
+    try:
+        sample_path = get_derivative(music_file, f"sample_{duration}s", sample_preset(duration), timeout=timeout)
+    except TimeoutError:
+        return "Sample is still rendering. Try again shortly or post the full track."
+    except Exception as e:
+        return f"Error creating sample: {str(e)[:200]}"
     
     return f"Sample created: {sample_path} ({duration} seconds)"
 
 
+# Posting is a side effect; it can also restore an archived track
+@writes("music")
 @tool
 def post_to_social_media(music_file: str, caption: str, platform: str = "all") -> str:
     """Posts music to social media platforms.
@@ -69,6 +92,7 @@ def post_to_social_media(music_file: str, caption: str, platform: str = "all") -
     """
     print("Posting to social media...")
     
+    music_file = resolve_track(music_file)
     if not os.path.exists(music_file):
         return f"Music file not found: {music_file}"
     
@@ -76,4 +100,11 @@ def post_to_social_media(music_file: str, caption: str, platform: str = "all") -
     now = datetime.now()
     post_id = f"POST_{now.strftime('%Y%m%d%H%M%S')}"
     
-    return f"Posted to {', '.join(platforms)}!\n- File: {music_file}\n- Caption: {caption}\n- Post ID: {post_id}\n- Time: {now.strftime('%Y-%m-%d %H:%M:%S')}"
\ No newline at end of file
+    # Use the pre-rendered platform preview when the pipeline has produced one
+    assets = []
+    for name in platforms:
+        preset = name.lower()
+        preview = find_derivative(music_file, preset) if preset in PLATFORM_PRESETS else None
+        assets.append(f"  {name}: {preview or music_file}")
+    
+    return f"Posted to {', '.join(platforms)}!\n- File: {music_file}\n- Assets:\n" + "\n".join(assets) + f"\n- Caption: {caption}\n- Post ID: {post_id}\n- Time: {now.strftime('%Y-%m-%d %H:%M:%S')}"
\ No newline at end of file
@@ -3,12 +3,112 @@ Music generation tools for the Music Agent
 """
 from langchain_core.tools import tool
 from gradio_client import Client
-from datetime import datetime
-import shutil
+import threading
 import json
+import time
 import os
 
+from utils.audio_derivatives import schedule_derivatives
+from utils.audio_analysis import schedule_analysis
+from utils.ffmpeg import ffmpeg_available
+from utils.ingest import INCOMING_DIR, ingest_audio
+from utils.singleflight import get_flight_group, FlightCancelled
+from utils.deadline import DeadlineExceeded, current_deadline, run_with_deadline
+from utils.tool_cache import read_only, writes
 
+# Identical concurrent requests share one ACE-Step generation
+_generation_flight = get_flight_group("generate_music")
+JOB_POLL_INTERVAL = 0.5
+
+# Max generations submitted to the backend at once (free GPU quota is scarce)
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "2"))
+_backend_slots = threading.BoundedSemaphore(GENERATION_CONCURRENCY)
+
+
+def _wait_for_job(job):
+    """Wait for a gradio job, cancelling it if the request is abandoned"""
+    deadline = current_deadline()
+    while not job.done():
+        if deadline is not None and deadline.is_set():
+            print("Cancelling remote generation job...")
+            job.cancel()
+            deadline.check()
+        time.sleep(JOB_POLL_INTERVAL)
+    return job.result()
+
+
+def _after_generation(output_path: str):
+    """Post-processing for a newly generated track (runs in the background)"""
+    if not ffmpeg_available():
+        print("ffmpeg not installed - skipping platform previews")
+        return
+    
+    previews = schedule_derivatives(output_path)
+    if previews:
+        print(f"Queued platform previews: {', '.join(previews)}")
+    
+    try:
+        schedule_analysis(output_path)
+    except Exception as e:
+        print(f"Could not queue analysis: {e}")
+
+
+def _acquire_backend_slot():
+    """Wait for a free backend slot, giving up if the request is abandoned"""
+    deadline = current_deadline()
+    while not _backend_slots.acquire(timeout=JOB_POLL_INTERVAL):
+        if deadline is not None:
+            deadline.check()
+
+
+def _run_generation(tags: str, lyrics: str, duration: int, seed: int = None) -> str:
+    """Call the ACE-Step backend and store the result, returning the saved path"""
+    _acquire_backend_slot()
+    try:
+        print("Connecting to HuggingFace API...")
+        # Download next to the library so the result can be hardlinked instead of copied
+        client = run_with_deadline(Client, "ACE-Step/ACE-Step", download_files=INCOMING_DIR)
+        print("Connected successfully")
+        
+        print(f"Sending generation request (seed: {seed if seed is not None else 'random'})...")
+        job = client.submit(
+            audio_duration=duration, prompt=tags, lyrics=lyrics,
+            infer_step=60, guidance_scale=15, scheduler_type="euler",
+            cfg_type="apg", omega_scale=10, manual_seeds=str(seed) if seed is not None else None,
+            guidance_interval=0.5, guidance_interval_decay=0,
+            min_guidance_scale=3, use_erg_tag=True, use_erg_lyric=False,
+            use_erg_diffusion=True, oss_steps=None, guidance_scale_text=0,
+            guidance_scale_lyric=0, audio2audio_enable=False,
+            ref_audio_strength=0.5, ref_audio_input=None,
+            lora_name_or_path="none", api_name="/__call__"
+        )
+        result = _wait_for_job(job)
+    finally:
+        _backend_slots.release()
+    
+    print("Generation completed")
+    
+    audio_path, metadata = result
+    output_path = ingest_audio(audio_path, seed=seed, tags=tags, duration=duration)
+    _after_generation(output_path)
+    return output_path
+
+
+def generate_track(tags: str, lyrics: str, duration: int = 15, seed: int = None) -> str:
+    """Generate one track (coalesced, deadline-aware) and return its path.
+    
+    Raises:
+        DeadlineExceeded / FlightCancelled if the request is abandoned,
+        or the backend error
+    """
+    deadline = current_deadline()
+    return _generation_flight.do(
+        (tags, lyrics, duration, seed), _run_generation, tags, lyrics, duration, seed,
+        cancel_event=deadline, timeout=deadline.timeout() if deadline else None
+    )
+
+
+@writes("music")
 @tool
 def generate_music(tags: str, lyrics: str, duration: int = 15) -> str:
     """Generates AI music with custom parameters.
@@ -30,29 +130,7 @@ def generate_music(tags: str, lyrics: str, duration: int = 15) -> str:
     print(f"{'='*60}\n")
     
     try:
-        print("Connecting to HuggingFace API...")
-        client = Client("ACE-Step/ACE-Step")
-        print("Connected successfully")
-        
-        print("Sending generation request...")
-        result = client.predict(
-            audio_duration=duration, prompt=tags, lyrics=lyrics,
-            infer_step=60, guidance_scale=15, scheduler_type="euler",
-            cfg_type="apg", omega_scale=10, manual_seeds=None,
-            guidance_interval=0.5, guidance_interval_decay=0,
-            min_guidance_scale=3, use_erg_tag=True, use_erg_lyric=False,
-            use_erg_diffusion=True, oss_steps=None, guidance_scale_text=0,
-            guidance_scale_lyric=0, audio2audio_enable=False,
-            ref_audio_strength=0.5, ref_audio_input=None,
-            lora_name_or_path="none", api_name="/__call__"
-        )
-        
-        print("Generation completed")
-        
-        audio_path, metadata = result
-        os.makedirs("generated_music", exist_ok=True)
-        output_path = f"generated_music/music_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3"
-        shutil.copy(audio_path, output_path)
+        output_path = generate_track(tags, lyrics, duration)
         
         print(f"\n{'='*60}")
         print(f"SUCCESS: Music saved to {output_path}")
@@ -60,6 +138,10 @@ def generate_music(tags: str, lyrics: str, duration: int = 15) -> str:
         
         return f"Music generated successfully: {output_path}"
         
+    except (DeadlineExceeded, FlightCancelled):
+        print("MUSIC GENERATION ABANDONED (request deadline exceeded or cancelled)")
+        return "Music generation abandoned: the request ran out of time or was cancelled."
+        
     except Exception as e:
         error_msg = str(e)
         
@@ -81,6 +163,7 @@ def generate_music(tags: str, lyrics: str, duration: int = 15) -> str:
             return f"Error generating music: {error_msg[:200]}"
 
 
+@read_only()
 @tool
 def get_music_mood_preset(mood: str) -> str:
     """Get preset tags and lyrics for a specific mood.
@@ -0,0 +1,234 @@
+"""
+Billing analytics: time-bucketed revenue and activity rollups over the payment ledger.
+
+Rollups live in their own file and are updated incrementally by every
+process_payment, so range queries never scan the full payment history.
+The file records a ledger watermark (database mtime and payment count folded
+in); when the ledger has moved past it, e.g. after a failed update, the
+rollups are rebuilt on the next read.
+All timestamps are numeric (Unix seconds); buckets are keyed by local date.
+"""
+from filelock import FileLock
+from datetime import datetime, timedelta
+import threading
+import bisect
+import json
+import os
+
+from utils.database import DB_FILE, load_database
+
+ANALYTICS_FILE = "billing_analytics.json"
+LEGACY_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_lock = threading.RLock()
+_file_lock = FileLock(f"{ANALYTICS_FILE}.lock")
+_cache = {"mtime": None, "data": None, "index": None}
+
+
+def parse_timestamp(value) -> float:
+    """Convert a stored timestamp (numeric or legacy string) to Unix seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.strptime(value, LEGACY_TIME_FORMAT).timestamp()
+
+
+def _day_key(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+
+
+def _empty():
+    return {"daily": {}, "customers": {}, "ledger": {"mtime": None, "payments": 0}}
+
+
+def _ledger_mtime():
+    return os.stat(DB_FILE).st_mtime_ns if os.path.exists(DB_FILE) else None
+
+
+def _add_payment(rollups: dict, customer_name: str, amount: float, ts: float):
+    day = rollups["daily"].setdefault(_day_key(ts), {"revenue": 0.0, "payments": 0, "customers": []})
+    day["revenue"] = round(day["revenue"] + amount, 2)
+    day["payments"] += 1
+    if customer_name not in day["customers"]:
+        day["customers"].append(customer_name)
+
+    customer = rollups["customers"].setdefault(customer_name, {"first_ts": ts, "last_ts": ts, "total": 0.0, "payments": 0})
+    customer["first_ts"] = min(customer["first_ts"] or ts, ts)
+    customer["last_ts"] = max(customer["last_ts"] or ts, ts)
+    customer["total"] = round(customer["total"] + amount, 2)
+    customer["payments"] += 1
+
+
+def rebuild_rollups(db: dict = None) -> dict:
+    """Recompute all rollups from the payment ledger"""
+    mtime = _ledger_mtime()  # taken before reading, so a concurrent save leaves us behind, not ahead
+    db = db or load_database()
+    rollups = _empty()
+    rollups["ledger"]["mtime"] = mtime
+
+    for name, data in db.get("customers", {}).items():
+        payments = data.get("payments", [])
+        rollups["ledger"]["payments"] += len(payments)
+        for payment in payments:
+            ts = parse_timestamp(payment.get("ts", payment["timestamp"]))
+            _add_payment(rollups, name, payment["amount"], ts)
+        if not payments:
+            created = data.get("created_at_ts", data.get("created_at"))
+            created = parse_timestamp(created) if created else None
+            rollups["customers"][name] = {"first_ts": created, "last_ts": None, "total": 0.0, "payments": 0}
+
+    _save(rollups)
+    return rollups
+
+
+def _save(rollups: dict):
+    with _lock:
+        tmp_path = f"{ANALYTICS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(rollups, f)
+        os.replace(tmp_path, ANALYTICS_FILE)
+        _cache.update(mtime=os.stat(ANALYTICS_FILE).st_mtime_ns, data=rollups, index=None)
+
+
+def _read():
+    """Cached rollups file contents, or None if there is no file yet"""
+    if not os.path.exists(ANALYTICS_FILE):
+        return None
+    mtime = os.stat(ANALYTICS_FILE).st_mtime_ns
+    if _cache["mtime"] != mtime:
+        with open(ANALYTICS_FILE, 'r') as f:
+            _cache.update(mtime=mtime, data=json.load(f), index=None)
+    return _cache["data"]
+
+
+def _caught_up(rollups) -> bool:
+    return rollups is not None and rollups.get("ledger", {}).get("mtime") == _ledger_mtime()
+
+
+def load_rollups() -> dict:
+    """Load rollups, rebuilding them if the ledger has moved past their watermark"""
+    with _lock:
+        rollups = _read()
+        if not _caught_up(rollups):
+            with _file_lock:
+                rollups = _read()
+                if not _caught_up(rollups):
+                    # First use, or payments whose analytics update failed
+                    return rebuild_rollups() if os.path.exists(DB_FILE) else _empty()
+        return rollups
+
+
+def record_payment(customer_name: str, amount: float, ts: float, ledger_payments: int):
+    """Fold one new payment (already saved to the ledger) into the rollups.
+
+    ledger_payments is the number of payments in the saved ledger, this one
+    included. If the rollups are behind by more than this payment, they are
+    rebuilt from the ledger instead.
+    """
+    with _lock, _file_lock:
+        rollups = None
+        if os.path.exists(ANALYTICS_FILE):
+            with open(ANALYTICS_FILE, 'r') as f:
+                rollups = json.load(f)  # own copy: readers may be using the cached one
+        if rollups is None or rollups.get("ledger", {}).get("payments") != ledger_payments - 1:
+            # Missing, or an earlier payment was never folded in (failed update or concurrent save)
+            rebuild_rollups()
+            return
+        _add_payment(rollups, customer_name, amount, ts)
+        rollups["ledger"] = {"mtime": _ledger_mtime(), "payments": ledger_payments}
+        _save(rollups)
+
+
+def _index():
+    """Sorted day keys with prefix sums, plus customers sorted by last payment"""
+    rollups = load_rollups()
+    with _lock:
+        if _cache["index"] is None or _cache["data"] is not rollups:
+            days = sorted(rollups["daily"])
+            revenue_prefix, payments_prefix = [0.0], [0]
+            for day in days:
+                revenue_prefix.append(revenue_prefix[-1] + rollups["daily"][day]["revenue"])
+                payments_prefix.append(payments_prefix[-1] + rollups["daily"][day]["payments"])
+
+            by_last_payment = sorted(
+                (data["last_ts"] or 0.0, name) for name, data in rollups["customers"].items()
+            )
+            _cache["index"] = {
+                "days": days,
+                "revenue_prefix": revenue_prefix,
+                "payments_prefix": payments_prefix,
+                "by_last_payment": by_last_payment,
+            }
+        return rollups, _cache["index"]
+
+
+def revenue_between(start_ts: float, end_ts: float) -> dict:
+    """Revenue and payment count for [start_ts, end_ts] at day granularity"""
+    _, index = _index()
+    lo = bisect.bisect_left(index["days"], _day_key(start_ts))
+    hi = bisect.bisect_right(index["days"], _day_key(end_ts))
+
+    return {
+        "start": _day_key(start_ts),
+        "end": _day_key(end_ts),
+        "revenue": round(index["revenue_prefix"][hi] - index["revenue_prefix"][lo], 2),
+        "payments": index["payments_prefix"][hi] - index["payments_prefix"][lo],
+    }
+
+
+def revenue_series(start_ts: float, end_ts: float, bucket: str = "day") -> list:
+    """Per-day or per-month revenue buckets in a range"""
+    rollups, index = _index()
+    lo = bisect.bisect_left(index["days"], _day_key(start_ts))
+    hi = bisect.bisect_right(index["days"], _day_key(end_ts))
+    key_len = 7 if bucket == "month" else 10
+
+    series = {}
+    for day in index["days"][lo:hi]:
+        data = rollups["daily"][day]
+        point = series.setdefault(day[:key_len], {"period": day[:key_len], "revenue": 0.0, "payments": 0, "customers": set()})
+        point["revenue"] = round(point["revenue"] + data["revenue"], 2)
+        point["payments"] += data["payments"]
+        point["customers"].update(data["customers"])
+
+    return [{**point, "customers": len(point["customers"])} for point in series.values()]
+
+
+def customers_unpaid_since(days: int = 30, now: float = None) -> dict:
+    """Customers whose last payment is older than `days`.
+
+    Returns:
+        {"churned": [...], "never_paid": [...]} - churned customers paid at
+        least once; each entry has name, last payment and days since
+    """
+    now = now or datetime.now().timestamp()
+    cutoff = now - days * 86400
+    rollups, index = _index()
+    hi = bisect.bisect_left(index["by_last_payment"], (cutoff, ""))
+
+    churned, never_paid = [], []
+    for last_ts, name in index["by_last_payment"][:hi]:
+        if not last_ts:
+            never_paid.append({"name": name})
+            continue
+        churned.append({
+            "name": name,
+            "last_payment": datetime.fromtimestamp(last_ts).strftime(LEGACY_TIME_FORMAT),
+            "days_since_payment": int((now - last_ts) // 86400),
+            "total_paid": rollups["customers"][name]["total"],
+        })
+    return {"churned": churned, "never_paid": never_paid}
+
+
+def month_range(month: str = None):
+    """(start_ts, end_ts) for a 'YYYY-MM' month, default the current month"""
+    start = datetime.strptime(month, '%Y-%m') if month else datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
+    return start.timestamp(), end.timestamp()
+
+
+def parse_date(value: str, end_of_day: bool = False) -> float:
+    """Parse 'YYYY-MM-DD' into Unix seconds (start or end of that day)"""
+    day = datetime.strptime(value, '%Y-%m-%d')
+    if end_of_day:
+        day += timedelta(days=1, seconds=-1)
+    return day.timestamp()
\ No newline at end of file
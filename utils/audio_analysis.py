@@ -0,0 +1,143 @@
+"""
+Audio analysis for generated tracks: duration, bitrate, sample rate, loudness
+and downsampled waveform peaks.
+
+Each new file is analyzed once in the audio process pool. Scalar results go
+into the catalog; peaks go into a compact binary sidecar (one uint8 per bucket)
+so the UI can draw waveforms without any decoding at request time.
+"""
+import threading
+import os
+
+import numpy as np
+
+from utils.audio_derivatives import get_audio_pool
+from utils.catalog import MUSIC_DIR, get_track, update_track
+from utils.ffmpeg import probe_audio, decode_pcm, ffmpeg_available
+
+PEAKS_DIR = os.path.join(MUSIC_DIR, "peaks")
+PEAK_BUCKETS = 800
+ANALYSIS_SAMPLE_RATE = 22050
+
+_pending = set()
+_failed = {}  # name -> mtime of the version that failed, to avoid retry loops
+_pending_lock = threading.Lock()
+
+
+def peaks_path(name: str) -> str:
+    """Sidecar location of the waveform peaks for a track file name"""
+    return os.path.join(PEAKS_DIR, os.path.splitext(name)[0] + ".peaks")
+
+
+def compute_peaks(samples: np.ndarray, buckets: int = PEAK_BUCKETS) -> np.ndarray:
+    """Downsample PCM to per-bucket absolute peaks scaled to 0-255"""
+    if samples.size == 0:
+        return np.zeros(buckets, dtype=np.uint8)
+
+    # Pad to a multiple of the bucket count so the signal reshapes into rows
+    per_bucket = -(-samples.size // buckets)
+    padded = np.zeros(per_bucket * buckets, dtype=np.int32)
+    padded[:samples.size] = samples
+    peaks = np.abs(padded.reshape(buckets, per_bucket)).max(axis=1)
+
+    return np.minimum(peaks * 255 // 32768, 255).astype(np.uint8)
+
+
+def loudness_db(samples: np.ndarray) -> float:
+    """RMS loudness in dBFS"""
+    if samples.size == 0:
+        return -120.0
+    rms = np.sqrt(np.mean(np.square(samples.astype(np.float64)))) / 32768.0
+    return round(float(20 * np.log10(max(rms, 1e-6))), 2)
+
+
+def _analyze(path: str, peaks_file: str) -> dict:
+    """Probe and decode one file, write its peaks sidecar (runs in a worker process)"""
+    info = probe_audio(path)
+    samples = np.frombuffer(decode_pcm(path, ANALYSIS_SAMPLE_RATE), dtype=np.int16)
+
+    os.makedirs(os.path.dirname(peaks_file), exist_ok=True)
+    tmp_path = f"{peaks_file}.{os.getpid()}.part"
+    compute_peaks(samples).tofile(tmp_path)
+    os.replace(tmp_path, peaks_file)
+
+    info["loudness_db"] = loudness_db(samples)
+    if not info["duration"]:
+        info["duration"] = round(samples.size / ANALYSIS_SAMPLE_RATE, 3)
+    return info
+
+
+def _on_done(name: str, stat, future):
+    with _pending_lock:
+        _pending.discard(name)
+
+    if future.exception() is not None:
+        print(f"Analysis failed ({name}): {future.exception()}")
+        with _pending_lock:
+            _failed[name] = stat.st_mtime
+        return
+
+    update_track(name, analysis={
+        **future.result(),
+        "peaks": os.path.basename(peaks_path(name)),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    })
+
+
+def needs_analysis(name: str) -> bool:
+    """True when a track has no analysis or the file changed since it was analyzed"""
+    path = os.path.join(MUSIC_DIR, name)
+    entry = get_track(name) or {}
+    analysis = entry.get("analysis")
+    if not analysis or not os.path.exists(peaks_path(name)):
+        return True
+    stat = os.stat(path)
+    return analysis.get("size") != stat.st_size or analysis.get("mtime") != stat.st_mtime
+
+
+def schedule_analysis(path: str):
+    """Queue analysis of one track unless it is already done or in flight"""
+    name = os.path.basename(path)
+    stat = os.stat(path)
+    with _pending_lock:
+        if name in _pending or _failed.get(name) == stat.st_mtime or not needs_analysis(name):
+            return None
+        _pending.add(name)
+
+    try:
+        future = get_audio_pool().submit(_analyze, path, peaks_path(name))
+    except Exception:
+        with _pending_lock:
+            _pending.discard(name)
+        raise
+
+    future.add_done_callback(lambda f: _on_done(name, stat, f))
+    return future
+
+
+def schedule_missing_analysis(names=None) -> int:
+    """Queue analysis for every track that has none yet.
+
+    Args:
+        names: Track file names to check (default: scan generated_music/)
+
+    Returns:
+        Number of tracks queued
+    """
+    if not ffmpeg_available():
+        return 0
+
+    if names is None:
+        if not os.path.exists(MUSIC_DIR):
+            return 0
+        names = [f for f in os.listdir(MUSIC_DIR) if f.endswith('.mp3') and '_sample_' not in f]
+
+    queued = 0
+    for name in names:
+        try:
+            if schedule_analysis(os.path.join(MUSIC_DIR, name)) is not None:
+                queued += 1
+        except Exception as e:
+            print(f"Could not queue analysis for {name}: {e}")
+    return queued
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Audio derivative pipeline: platform previews, re-encoding and loudness normalization.
+
+Rendering is CPU-bound, so it runs in a process pool instead of the request
+thread. Outputs are cached on disk by (source content hash, preset).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import threading
+import hashlib
+import json
+import os
+
+from utils.ffmpeg import run_ffmpeg, probe_audio
+from utils.hashing import file_sha256
+
+DERIVATIVES_DIR = os.path.join("generated_music", "derivatives")
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", "2"))
+
+# Integrated loudness target (LUFS) used by most streaming/social platforms
+LOUDNESS_TARGET = -14.0
+
+PLATFORM_PRESETS = {
+    "twitter": {"duration": 30, "bitrate": "128k", "fade": 1.5},
+    "instagram": {"duration": 15, "bitrate": "128k", "fade": 1.0},
+    "facebook": {"duration": 30, "bitrate": "192k", "fade": 2.0},
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = {}  # derivative path -> Future
+_hash_cache = {}  # (path, size, mtime_ns) -> sha256
+
+
+def get_audio_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound audio work"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=AUDIO_WORKERS)
+        return _pool
+
+
+def sample_preset(duration: int) -> dict:
+    """Preset for a generic preview sample of the given length"""
+    return {"duration": duration, "bitrate": "128k", "fade": 1.0}
+
+
+def source_hash(path: str) -> str:
+    """Content hash of a source file, memoized on (path, size, mtime)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_cache:
+        _hash_cache[key] = file_sha256(path)
+    return _hash_cache[key]
+
+
+def derivative_path(source: str, preset_name: str, preset: dict) -> str:
+    """Cache location of a derivative for (source hash, preset)"""
+    params = hashlib.sha1(json.dumps(preset, sort_keys=True).encode()).hexdigest()[:8]
+    return os.path.join(DERIVATIVES_DIR, f"{source_hash(source)[:16]}_{preset_name}_{params}.mp3")
+
+
+def _render(source: str, dest: str, preset: dict) -> str:
+    """Trim, normalize, fade and re-encode one derivative (runs in a worker process)"""
+    source_duration = probe_audio(source)["duration"]
+    duration = min(preset["duration"], source_duration) if source_duration else preset["duration"]
+    fade = min(preset.get("fade", 0), duration / 4)
+
+    filters = [f"loudnorm=I={LOUDNESS_TARGET}:TP=-1.5:LRA=11"]
+    if fade:
+        filters.append(f"afade=t=in:st=0:d={fade}")
+        filters.append(f"afade=t=out:st={duration - fade:.3f}:d={fade}")
+
+    # Write to a temp file and rename so readers never see partial output
+    tmp_path = f"{dest}.{os.getpid()}.part"
+    try:
+        run_ffmpeg([
+            "-t", f"{duration:.3f}", "-i", source,
+            "-af", ",".join(filters),
+            "-ar", "44100", "-b:a", preset["bitrate"],
+            "-f", "mp3", tmp_path
+        ])
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return dest
+
+
+def _on_done(dest: str, future):
+    with _pool_lock:
+        if _pending.get(dest) is future:
+            del _pending[dest]
+    if future.exception() is not None:
+        print(f"Derivative failed ({os.path.basename(dest)}): {future.exception()}")
+
+
+def render_derivative(source: str, preset_name: str, preset: dict = None):
+    """Submit a derivative for rendering, reusing cached or in-flight results.
+
+    Returns:
+        (derivative_path, future) - future is None when already cached
+    """
+    preset = preset or PLATFORM_PRESETS[preset_name]
+    dest = derivative_path(source, preset_name, preset)
+
+    if os.path.exists(dest):
+        return dest, None
+
+    os.makedirs(DERIVATIVES_DIR, exist_ok=True)
+    pool = get_audio_pool()
+    with _pool_lock:
+        future = _pending.get(dest)
+        submitted = future is None
+        if submitted:
+            future = pool.submit(_render, source, dest, preset)
+            _pending[dest] = future
+
+    if submitted:
+        future.add_done_callback(lambda f: _on_done(dest, f))
+
+    return dest, future
+
+
+def get_derivative(source: str, preset_name: str, preset: dict = None, timeout: float = None) -> str:
+    """Return the path of a derivative, rendering it first if needed"""
+    dest, future = render_derivative(source, preset_name, preset)
+    if future is not None:
+        future.result(timeout=timeout)
+    return dest
+
+
+def find_derivative(source: str, preset_name: str, preset: dict = None):
+    """Return the cached derivative path if it is ready, else None"""
+    preset = preset or PLATFORM_PRESETS[preset_name]
+    dest = derivative_path(source, preset_name, preset)
+    return dest if os.path.exists(dest) else None
+
+
+def schedule_derivatives(source: str, presets: dict = None) -> dict:
+    """Queue all platform derivatives for a source without blocking.
+
+    Returns:
+        Mapping of preset name to derivative path
+    """
+    presets = presets or PLATFORM_PRESETS
+    paths = {}
+    for name, preset in presets.items():
+        try:
+            paths[name], _ = render_derivative(source, name, preset)
+        except Exception as e:
+            print(f"Could not schedule {name} derivative: {e}")
+    return paths
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Catalog of generated tracks (analysis results and file metadata)
+"""
+from contextlib import contextmanager
+from filelock import FileLock
+import threading
+import json
+import os
+
+MUSIC_DIR = "generated_music"
+CATALOG_FILE = os.path.join(MUSIC_DIR, "catalog.json")
+
+os.makedirs(MUSIC_DIR, exist_ok=True)
+
+_lock = threading.RLock()
+# Guards read-modify-write cycles across processes (web app + scheduler)
+_file_lock = FileLock(f"{CATALOG_FILE}.lock")
+_cache = {"mtime": None, "data": None}
+
+
+def _empty():
+    return {"tracks": {}}
+
+
+def load_catalog() -> dict:
+    """Load the catalog, reusing the parsed copy while the file is unchanged.
+
+    The returned dict is shared between threads: treat it as read-only.
+    """
+    with _lock:
+        if not os.path.exists(CATALOG_FILE):
+            return _empty()
+
+        mtime = os.stat(CATALOG_FILE).st_mtime_ns
+        if _cache["mtime"] != mtime:
+            with open(CATALOG_FILE, 'r') as f:
+                _cache["data"] = json.load(f)
+            _cache["mtime"] = mtime
+        return _cache["data"]
+
+
+def save_catalog(catalog: dict):
+    """Atomically write the catalog (temp file + rename)"""
+    with _lock:
+        tmp_path = f"{CATALOG_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(catalog, f, indent=2)
+        os.replace(tmp_path, CATALOG_FILE)
+        _cache["mtime"] = os.stat(CATALOG_FILE).st_mtime_ns
+        _cache["data"] = catalog
+
+
+def _writable(section: str) -> dict:
+    """Copy of the catalog with `section` copied too, safe to modify.
+
+    Readers may be iterating over the cached dict, so updates build a new
+    catalog instead of changing it in place.
+    """
+    catalog = dict(load_catalog())
+    catalog[section] = dict(catalog.get(section, {}))
+    return catalog
+
+
+@contextmanager
+def catalog_lock():
+    """Hold the catalog lock across several steps (e.g. create a track file, then register it)"""
+    with _lock, _file_lock:
+        yield
+
+
+def get_track(name: str):
+    """Return the catalog entry for a track file name, or None"""
+    return load_catalog()["tracks"].get(name)
+
+
+def update_track(name: str, **fields) -> dict:
+    """Merge fields into a track entry and persist the catalog"""
+    with _lock, _file_lock:
+        catalog = _writable("tracks")
+        entry = dict(catalog["tracks"].get(name, {}))
+        entry.update(fields)
+        catalog["tracks"][name] = entry
+        save_catalog(catalog)
+        return entry
+
+
+def remove_track(name: str):
+    """Drop a track entry from the catalog"""
+    with _lock, _file_lock:
+        catalog = _writable("tracks")
+        if catalog["tracks"].pop(name, None) is not None:
+            save_catalog(catalog)
+
+
+def get_group(group_id: str):
+    """Return a track group (e.g. a batch or album), or None"""
+    return load_catalog().get("groups", {}).get(group_id)
+
+
+def update_group(group_id: str, **fields) -> dict:
+    """Merge fields into a track group and persist the catalog"""
+    with _lock, _file_lock:
+        catalog = _writable("groups")
+        group = dict(catalog["groups"].get(group_id, {}))
+        group.update(fields)
+        catalog["groups"][group_id] = group
+        save_catalog(catalog)
+        return group
+
+
+def get_meta(key: str):
+    """Return a non-track catalog section (e.g. storage metrics), or None"""
+    return load_catalog().get("meta", {}).get(key)
+
+
+def update_meta(key: str, **fields) -> dict:
+    """Merge fields into a non-track catalog section and persist the catalog"""
+    with _lock, _file_lock:
+        catalog = _writable("meta")
+        section = dict(catalog["meta"].get(key, {}))
+        section.update(fields)
+        catalog["meta"][key] = section
+        save_catalog(catalog)
+        return section
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Customer name index: normalized exact lookup plus trigram fuzzy matching.
+
+Short names share too few trigrams for a one-letter typo to score ("Alan" and
+"Alen" share 2 of 5), so short queries are also scored by edit distance.
+
+The index is built once from the database and maintained incrementally as
+customers are added. It is rebuilt only when another process changes the
+database file, so every save made here must be reported via index_customer().
+"""
+from collections import Counter
+import threading
+import unicodedata
+import re
+import os
+
+from utils.database import DB_FILE, load_database
+
+# Fuzzy matches at or above this score are used without asking
+AUTO_MATCH_SCORE = 0.85
+# Fuzzy matches at or above this score are offered as suggestions
+SUGGEST_SCORE = 0.5
+# Queries up to this many characters are also scored by edit distance
+SHORT_NAME_LENGTH = 8
+# Typos tolerated by the edit-distance score
+MAX_TYPOS = 2
+
+
+def normalize_name(name: str) -> str:
+    """Case-, accent-, punctuation- and whitespace-insensitive form of a name"""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"[^\w\s]", " ", name.lower())
+    return " ".join(name.split())
+
+
+def _trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance (insertions, deletions and substitutions)"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class CustomerIndex:
+    """In-memory name index with exact and trigram (Dice coefficient) lookup"""
+
+    def __init__(self, names=()):
+        self._exact = {}     # normalized name -> stored name
+        self._grams = {}     # stored name -> trigram set
+        self._normalized = {}  # stored name -> normalized name
+        self._postings = {}  # trigram -> set of stored names
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._grams)
+
+    def add(self, name: str):
+        """Index a customer name (no-op if already present)"""
+        if name in self._grams:
+            return
+        normalized = normalize_name(name)
+        self._exact.setdefault(normalized, name)
+        self._normalized[name] = normalized
+        grams = _trigrams(normalized)
+        self._grams[name] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str):
+        """Drop a customer name from the index"""
+        grams = self._grams.pop(name, None)
+        if grams is None:
+            return
+        for gram in grams:
+            self._postings[gram].discard(name)
+        normalized = self._normalized.pop(name)
+        if self._exact.get(normalized) == name:
+            del self._exact[normalized]
+
+    def exact(self, query: str):
+        """Stored name matching the query after normalization, or None"""
+        return self._exact.get(normalize_name(query))
+
+    def search(self, query: str, limit: int = 3, min_score: float = SUGGEST_SCORE) -> list:
+        """Fuzzy matches as [(name, score)], best first; score is in [0, 1]"""
+        normalized = normalize_name(query)
+        grams = _trigrams(normalized)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        short = len(normalized) <= SHORT_NAME_LENGTH
+        scored = []
+        for name, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._grams[name]))
+            other = self._normalized[name]
+            if short and abs(len(other) - len(normalized)) <= MAX_TYPOS:
+                distance = _edit_distance(normalized, other)
+                if distance <= MAX_TYPOS:
+                    score = max(score, 1 - distance / max(len(normalized), len(other)))
+            if score >= min_score:
+                scored.append((name, round(score, 3)))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def lookup(self, query: str) -> dict:
+        """Resolve a name the way the billing tools need it.
+
+        Returns:
+            {"match": stored name or None, "confidence": float, "candidates": [(name, score)]}
+            match is set for exact matches and for a single confident fuzzy match
+        """
+        name = self.exact(query)
+        if name is not None:
+            return {"match": name, "confidence": 1.0, "candidates": [(name, 1.0)]}
+
+        candidates = self.search(query)
+        if candidates and candidates[0][1] >= AUTO_MATCH_SCORE:
+            runner_up = candidates[1][1] if len(candidates) > 1 else 0.0
+            if candidates[0][1] - runner_up >= 0.1:
+                return {"match": candidates[0][0], "confidence": candidates[0][1], "candidates": candidates}
+        return {"match": None, "confidence": candidates[0][1] if candidates else 0.0, "candidates": candidates}
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def _db_mtime():
+    return os.stat(DB_FILE).st_mtime_ns if os.path.exists(DB_FILE) else None
+
+
+def get_customer_index() -> CustomerIndex:
+    """Process-wide index, rebuilt only if the database changed behind our back"""
+    global _index, _index_mtime
+    with _index_lock:
+        mtime = _db_mtime()
+        if _index is None or mtime != _index_mtime:
+            _index = CustomerIndex(load_database().get("customers", {}))
+            _index_mtime = mtime
+        return _index
+
+
+def index_customer(name: str):
+    """Report a database save for `name` (new or existing) without a rebuild"""
+    global _index_mtime
+    with _index_lock:
+        if _index is None:
+            return  # built on the next lookup
+        _index.add(name)
+        _index_mtime = _db_mtime()
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Request deadlines and cancellation.
+
+A Deadline is created per request by the supervisor and passed explicitly to
+agents. Tools, the LLM client and the gradio client pick it up from the
+current context via current_deadline(), since tool signatures are fixed by the
+LLM-facing schema.
+"""
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+import os
+
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "300"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline or is cancelled"""
+
+
+class Deadline:
+    """Absolute time limit plus a cancellation flag for one request"""
+
+    def __init__(self, timeout: float = None):
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Abandon the request (e.g. the client disconnected)"""
+        self.reason = reason
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self):
+        """Seconds left, or None when there is no time limit"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def is_set(self) -> bool:
+        """True once cancelled or expired (lets a Deadline act as a cancel event)"""
+        return self.cancelled or self.remaining() == 0.0
+
+    def check(self):
+        """Raise DeadlineExceeded if the request should stop"""
+        if self.cancelled:
+            raise DeadlineExceeded(f"Request {self.reason}")
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def timeout(self, cap: float = None):
+        """Seconds to allow a blocking call: the remaining time, optionally capped"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(remaining, cap)
+
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline():
+    """Deadline of the request being processed in this context, or None"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """Make `deadline` the current deadline inside the block"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current request should stop"""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+
+
+def run_with_deadline(fn, *args, deadline: Deadline = None, poll: float = 0.1, **kwargs):
+    """Run a blocking call, giving up when the deadline passes or is cancelled.
+
+    The call keeps running in a daemon thread after we give up; its result is
+    discarded.
+    """
+    deadline = deadline or current_deadline()
+    if deadline is None:
+        return fn(*args, **kwargs)
+
+    deadline.check()
+    outcome = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome["result"] = fn(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(target,), daemon=True).start()
+    while not done.wait(poll):
+        deadline.check()
+
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+FFmpeg helpers for audio processing (trimming, re-encoding, probing, decoding)
+"""
+import subprocess
+import shutil
+import json
+import os
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+
+
+class FFmpegError(RuntimeError):
+    """Raised when an ffmpeg/ffprobe call fails"""
+
+
+def ffmpeg_available() -> bool:
+    """Check whether ffmpeg is installed"""
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+def _run(cmd, timeout=None) -> bytes:
+    try:
+        proc = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        raise FFmpegError(f"{cmd[0]} not found. Install ffmpeg to enable audio processing.")
+    except subprocess.TimeoutExpired:
+        raise FFmpegError(f"{cmd[0]} timed out after {timeout}s")
+    
+    if proc.returncode != 0:
+        raise FFmpegError(proc.stderr.decode(errors="replace").strip()[-500:])
+    return proc.stdout
+
+
+def run_ffmpeg(args, timeout=None) -> bytes:
+    """Run ffmpeg with the given arguments and return its stdout"""
+    return _run([FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y"] + list(args), timeout)
+
+
+def probe_audio(path: str) -> dict:
+    """Read duration, bitrate and sample rate of an audio file"""
+    out = _run([
+        FFPROBE_BIN, "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "format=duration,bit_rate:stream=sample_rate,channels",
+        "-of", "json", path
+    ])
+    info = json.loads(out or b"{}")
+    fmt = info.get("format", {})
+    stream = (info.get("streams") or [{}])[0]
+    
+    return {
+        "duration": float(fmt.get("duration") or 0.0),
+        "bitrate": int(fmt.get("bit_rate") or 0),
+        "sample_rate": int(stream.get("sample_rate") or 0),
+        "channels": int(stream.get("channels") or 0),
+    }
+
+
+def decode_pcm(path: str, sample_rate: int = 22050) -> bytes:
+    """Decode an audio file to mono signed 16-bit little-endian PCM"""
+    return run_ffmpeg(["-i", path, "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"])
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Content hashing helpers for generated files
+"""
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Ingest of generated audio into generated_music/.
+
+The gradio client downloads straight into INCOMING_DIR, which sits on the same
+filesystem as the library, so a finished download is hardlinked into place
+instead of copied. The final name is claimed with os.link (or, without hardlink
+support, an exclusive create followed by a rename), which fails rather than
+overwrites, so concurrent generations (threads or processes) never clobber each
+other. The name is claimed and the track registered under the catalog lock,
+which compaction also takes to list tracks, so it never sees an unregistered file.
+"""
+from datetime import datetime
+import hashlib
+import uuid
+import os
+
+from utils.catalog import MUSIC_DIR, catalog_lock, update_track
+from utils.hashing import CHUNK_SIZE, file_sha256
+from utils.tool_cache import invalidate
+
+# Backend download directory (same filesystem as MUSIC_DIR)
+INCOMING_DIR = os.path.join(MUSIC_DIR, ".incoming")
+
+
+class IngestError(RuntimeError):
+    """Raised when a downloaded file cannot be stored or fails verification"""
+
+
+def _stage(source: str) -> tuple:
+    """Put the source content into a private file next to the library.
+
+    Returns:
+        (staged_path, sha256, copied) - copied is False when hardlinked
+    """
+    staged = os.path.join(MUSIC_DIR, f".ingest-{uuid.uuid4().hex}.part")
+    try:
+        os.link(source, staged)
+        return staged, file_sha256(staged), False
+    except OSError:
+        pass  # other filesystem (or no hardlink support): stream a copy
+
+    digest = hashlib.sha256()
+    with open(source, 'rb') as src, open(staged, 'xb') as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    return staged, digest.hexdigest(), True
+
+
+def _place(staged: str, path: str):
+    """Give the staged content the name `path`, raising FileExistsError if it is taken"""
+    try:
+        os.link(staged, path)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hardlink support: reserve the name exclusively, then move the content over it
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(staged, path)
+
+
+def _claim_name(staged: str, prefix: str, ext: str) -> str:
+    """Put the staged file under the first free timestamped name"""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    suffix = 1
+    while True:
+        name = f"{prefix}_{stamp}{ext}" if suffix == 1 else f"{prefix}_{stamp}_{suffix}{ext}"
+        try:
+            _place(staged, os.path.join(MUSIC_DIR, name))
+            return name
+        except FileExistsError:
+            # Parallel generations can finish within the same second
+            suffix += 1
+
+
+def ingest_audio(source: str, prefix: str = "music", **fields) -> str:
+    """Move a downloaded audio file into the library and register it.
+
+    Args:
+        source: Downloaded file (removed after a successful ingest)
+        prefix: File name prefix
+        fields: Extra catalog fields (e.g. seed, tags)
+
+    Returns:
+        Path of the stored track
+
+    Raises:
+        IngestError if the source is missing, empty or changes while stored
+    """
+    if not os.path.isfile(source) or os.path.getsize(source) == 0:
+        raise IngestError(f"Generated file missing or empty: {source}")
+
+    ext = os.path.splitext(source)[1] or ".mp3"
+    size = os.path.getsize(source)
+    staged, digest, copied = _stage(source)
+    try:
+        if os.path.getsize(staged) != size:
+            raise IngestError(f"Size mismatch storing {source}")
+        with catalog_lock():
+            name = _claim_name(staged, prefix, ext)
+            path = os.path.join(MUSIC_DIR, name)
+            stat = os.stat(path)
+            update_track(name, sha256=digest, size=stat.st_size, mtime=stat.st_mtime, tier="hot",
+                         created=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **fields)
+    finally:
+        if os.path.exists(staged):  # already moved into place without hardlinks
+            os.remove(staged)
+
+    invalidate(["music"])  # also covers generations started outside an agent tool
+    _discard_source(source)
+    print(f"Stored {name} ({size / 1024:.0f} KB, {'copied' if copied else 'linked'})")
+    return path.replace(os.sep, "/")
+
+
+def _discard_source(source: str):
+    """Remove the backend download and its per-file folder inside INCOMING_DIR"""
+    try:
+        os.remove(source)
+    except OSError as e:
+        print(f"Could not remove download {source}: {e}")
+        return
+
+    parent = os.path.dirname(os.path.abspath(source))
+    incoming = os.path.abspath(INCOMING_DIR)
+    if os.path.dirname(parent) == incoming:
+        try:
+            os.rmdir(parent)
+        except OSError:
+            pass  # not empty: another download shares the folder
\ No newline at end of file
@@ -0,0 +1,298 @@
+"""
+Leases for running scheduler jobs on exactly one instance.
+
+Every scheduler instance campaigns for a time-limited lease and renews it in
+the background while alive. Only the holder runs jobs; if it crashes, the
+lease expires and another instance takes over. Each job run is also claimed
+per period (e.g. the billing month), so a takeover never repeats a run that
+already happened. Only the latest period of each job is kept, so the run
+history does not grow.
+
+Backends must make acquire and claim atomic across all instances. SQLite and
+a JSON file behind a file lock cover instances sharing one machine or a local
+disk; for several hosts, implement LeaseBackend on a shared store (Redis
+SET NX PX, a database row with a conditional UPDATE, ...). Expiry uses wall
+clock time, so hosts need synchronized clocks (NTP) and a TTL well above the
+expected skew.
+"""
+from abc import ABC, abstractmethod
+from filelock import FileLock
+from datetime import datetime, timedelta
+import threading
+import sqlite3
+import socket
+import json
+import time
+import uuid
+import os
+
+LEASE_BACKEND = os.getenv("SCHEDULER_LEASE_BACKEND", "sqlite")
+LEASE_PATH = os.getenv("SCHEDULER_LEASE_PATH", "")
+LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", "30"))
+# Runs left "running" by a crashed instance are forgotten after this long
+STALE_RUN_SECONDS = 7 * 86400
+
+
+def instance_id() -> str:
+    """Unique owner id for this process (host, pid and a random suffix)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _timestamp(seconds_ago: float = 0) -> str:
+    return (datetime.now() - timedelta(seconds=seconds_ago)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LeaseBackend(ABC):
+    """Interface for the store shared by all scheduler instances"""
+
+    @abstractmethod
+    def try_acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take the lease if free or expired, or renew it if `owner` holds it"""
+
+    @abstractmethod
+    def release(self, name: str, owner: str):
+        """Give up the lease if `owner` holds it"""
+
+    @abstractmethod
+    def holder(self, name: str):
+        """Current {"owner", "expires_at"} of an unexpired lease, or None"""
+
+    @abstractmethod
+    def claim_run(self, job: str, period: str, owner: str) -> bool:
+        """Record that `owner` runs `job` for `period`; False if already claimed.
+
+        A successful claim drops the job's earlier finished periods (and
+        stale unfinished ones), keeping the history bounded.
+        """
+
+    @abstractmethod
+    def finish_run(self, job: str, period: str, status: str):
+        """Record how a claimed run ended ("done" or "failed")"""
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Leases and run claims in a SQLite file (one machine or a local disk)"""
+
+    def __init__(self, path: str = "scheduler_leases.db"):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS runs (job TEXT, period TEXT, owner TEXT, started TEXT, "
+                         "status TEXT, PRIMARY KEY (job, period))")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def try_acquire(self, name, owner, ttl):
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, making read-check-write atomic
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            now = time.time()
+            if row and row[0] != owner and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (name, owner, now + ttl))
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def release(self, name, owner):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+        finally:
+            conn.close()
+
+    def holder(self, name):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ? AND expires_at > ?",
+                               (name, time.time())).fetchone()
+        finally:
+            conn.close()
+        return {"owner": row[0], "expires_at": row[1]} if row else None
+
+    def claim_run(self, job, period, owner):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute("INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, 'running')",
+                                  (job, period, owner, _timestamp()))
+            claimed = cursor.rowcount == 1
+            if claimed:
+                conn.execute("DELETE FROM runs WHERE job = ? AND period != ? AND (status != 'running' OR started < ?)",
+                             (job, period, _timestamp(STALE_RUN_SECONDS)))
+            conn.execute("COMMIT")
+            return claimed
+        finally:
+            conn.close()
+
+    def finish_run(self, job, period, status):
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE runs SET status = ? WHERE job = ? AND period = ?", (status, job, period))
+        finally:
+            conn.close()
+
+
+class FileLeaseBackend(LeaseBackend):
+    """Leases and run claims in a JSON file guarded by a file lock"""
+
+    def __init__(self, path: str = "scheduler_leases.json"):
+        self.path = path
+        self._file_lock = FileLock(f"{path}.lock")
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {"leases": {}, "runs": {}}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def _save(self, data: dict):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def try_acquire(self, name, owner, ttl):
+        with self._file_lock:
+            data = self._load()
+            lease = data["leases"].get(name)
+            now = time.time()
+            if lease and lease["owner"] != owner and lease["expires_at"] > now:
+                return False
+            data["leases"][name] = {"owner": owner, "expires_at": now + ttl}
+            self._save(data)
+            return True
+
+    def release(self, name, owner):
+        with self._file_lock:
+            data = self._load()
+            if data["leases"].get(name, {}).get("owner") == owner:
+                del data["leases"][name]
+                self._save(data)
+
+    def holder(self, name):
+        lease = self._load()["leases"].get(name)
+        return lease if lease and lease["expires_at"] > time.time() else None
+
+    def claim_run(self, job, period, owner):
+        with self._file_lock:
+            data = self._load()
+            runs = data["runs"].get(job, {})
+            if period in runs:
+                return False
+            stale_before = _timestamp(STALE_RUN_SECONDS)
+            runs = {p: run for p, run in runs.items() if run["status"] == "running" and run["started"] >= stale_before}
+            runs[period] = {"owner": owner, "started": _timestamp(), "status": "running"}
+            data["runs"][job] = runs
+            self._save(data)
+            return True
+
+    def finish_run(self, job, period, status):
+        with self._file_lock:
+            data = self._load()
+            run = data["runs"].get(job, {}).get(period)
+            if run is not None:
+                run["status"] = status
+                self._save(data)
+
+
+def get_lease_backend(kind: str = None, path: str = None) -> LeaseBackend:
+    """Backend selected by SCHEDULER_LEASE_BACKEND ("sqlite" or "file")"""
+    kind = kind or LEASE_BACKEND
+    path = path or LEASE_PATH
+    if kind == "sqlite":
+        return SQLiteLeaseBackend(path or "scheduler_leases.db")
+    if kind == "file":
+        return FileLeaseBackend(path or "scheduler_leases.json")
+    raise ValueError(f"Unknown lease backend: {kind}")
+
+
+class Lease:
+    """A named lease that this process keeps campaigning for and renewing"""
+
+    def __init__(self, backend: LeaseBackend, name: str, ttl: float = LEASE_TTL, owner: str = None):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or instance_id()
+        self._valid_until = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def held(self) -> bool:
+        """True while our last successful renewal has not run out"""
+        return time.monotonic() < self._valid_until
+
+    def acquire(self) -> bool:
+        """Try once to take or renew the lease"""
+        was_held = self.held
+        started = time.monotonic()
+        try:
+            acquired = self.backend.try_acquire(self.name, self.owner, self.ttl)
+        except Exception as e:
+            print(f"Lease {self.name}: backend error: {e}")
+            acquired = False
+
+        if acquired:
+            # Count from before the call so we never believe we hold it longer than the store does
+            self._valid_until = started + self.ttl
+            if not was_held:
+                print(f"Lease {self.name}: acquired by {self.owner}")
+        elif was_held and not self.held:
+            print(f"Lease {self.name}: lost by {self.owner}")
+        return acquired
+
+    def start(self):
+        """Campaign and renew in a background thread (every third of the TTL)"""
+        if self._thread is None:
+            self.acquire()
+            self._thread = threading.Thread(target=self._run, name=f"lease-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            self.acquire()
+
+    def stop(self):
+        """Stop renewing and hand the lease over immediately"""
+        self._stop.set()
+        if self.held:
+            self._valid_until = 0.0
+            self.backend.release(self.name, self.owner)
+            print(f"Lease {self.name}: released by {self.owner}")
+
+
+def run_once(lease: Lease, job: str, period: str, fn, *args, **kwargs):
+    """Run fn only if this instance holds the lease and nobody ran `job` for `period`.
+
+    Runs are at most once per period: a run that crashes midway is not
+    repeated by another instance (it is left with status "running").
+
+    Returns:
+        True if fn ran here, False if it was skipped
+    """
+    if not lease.held:
+        holder = lease.backend.holder(lease.name)
+        print(f"Skipping {job}: leader is {holder['owner'] if holder else 'not elected yet'}")
+        return False
+    if not lease.backend.claim_run(job, period, lease.owner):
+        print(f"Skipping {job}: already ran for {period}")
+        return False
+
+    status = "failed"
+    try:
+        fn(*args, **kwargs)
+        status = "done"
+    finally:
+        lease.backend.finish_run(job, period, status)
+    return True
\ No newline at end of file
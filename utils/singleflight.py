@@ -0,0 +1,164 @@
+"""
+In-flight request coalescing (single-flight).
+
+Concurrent calls with the same key attach to one execution and share its
+result. Each caller can stop waiting on its own (cancel event or timeout)
+without affecting the others. The execution runs under its own Deadline,
+which is cancelled once every caller has left, so remote work can be dropped.
+"""
+import contextvars
+import threading
+import time
+
+from utils.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+
+
+class FlightCancelled(Exception):
+    """Raised to a caller that stopped waiting for a shared execution"""
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.deadline = Deadline()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into a single execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "cancelled": 0}
+
+    def do(self, key, fn, *args, cancel_event=None, timeout=None, **kwargs):
+        """Run fn(*args, **kwargs) once per key among concurrent callers.
+
+        Args:
+            key: Hashable identity of the call
+            cancel_event: Optional threading.Event; when set this caller stops waiting
+            timeout: Optional seconds this caller is willing to wait
+
+        Returns:
+            The shared result (exceptions are re-raised to every caller)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            # A flight abandoned by all its callers is being torn down: start a fresh one
+            leader = flight is None or flight.deadline.cancelled
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+                print(f"[{self.name}] Joined in-flight call ({flight.waiters} already waiting)")
+            flight.waiters += 1
+
+        if leader:
+            # Run in its own thread so any caller (the first one included) can walk away
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._execute, key, flight, fn, args, kwargs),
+                name=f"singleflight-{self.name}", daemon=True
+            ).start()
+
+        return self._wait(flight, cancel_event, timeout)
+
+    def _execute(self, key, flight, fn, args, kwargs):
+        try:
+            with deadline_scope(flight.deadline):
+                flight.result = fn(*args, **kwargs)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def _wait(self, flight, cancel_event, timeout):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not flight.done.wait(0.1):
+            expired = deadline is not None and time.monotonic() >= deadline
+            if expired or (cancel_event is not None and cancel_event.is_set()):
+                with self._lock:
+                    flight.waiters -= 1
+                    self._stats["cancelled"] += 1
+                    if flight.waiters == 0:
+                        flight.deadline.cancel("abandoned by all callers")
+                raise FlightCancelled(f"{self.name}: caller stopped waiting")
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self) -> dict:
+        """Call counters and the share of calls served by another caller's execution"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        stats["coalescing_rate"] = round(stats["coalesced"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return stats
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+def get_flight_group(name: str) -> SingleFlight:
+    """Return the process-wide SingleFlight group with this name"""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def coalescing_stats() -> dict:
+    """Stats for every SingleFlight group in this process"""
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.stats() for name, group in groups.items()}
+
+
+def _message_key(value):
+    """Hashable key for an LLM input (prompt string or list of messages)"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_message_key(item) for item in value)
+    if hasattr(value, "content"):
+        return (getattr(value, "type", type(value).__name__), _message_key(value.content))
+    return repr(value)
+
+
+class CoalescingLLM:
+    """Wraps a chat model so identical concurrent invoke() calls share one request"""
+
+    def __init__(self, llm, group: str = "llm"):
+        self.llm = llm
+        self.flight = get_flight_group(group)
+
+    def invoke(self, input, config=None, **kwargs):
+        """Invoke the model, honouring the current request deadline"""
+        if kwargs:
+            return self.llm.invoke(input, config, **kwargs)
+
+        deadline = current_deadline()
+        if deadline is None:
+            return self.flight.do(_message_key(input), self.llm.invoke, input, config)
+
+        deadline.check()
+        try:
+            return self.flight.do(_message_key(input), self.llm.invoke, input, config,
+                                  cancel_event=deadline, timeout=deadline.timeout())
+        except FlightCancelled:
+            raise DeadlineExceeded(f"LLM call abandoned: request {deadline.reason or 'deadline exceeded'}")
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
\ No newline at end of file
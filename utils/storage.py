@@ -0,0 +1,306 @@
+"""
+Storage manager for generated_music/: retention, deduplication and an archive tier.
+
+The hot directory only keeps recent tracks. Cold tracks are moved as-is to the
+archive volume (MUSIC_ARCHIVE_DIR) and restored transparently by resolve_track()
+when requested. MP3s are already compressed (zstd saves well under 1%), so the
+archive frees the hot disk rather than shrinking files; without
+MUSIC_ARCHIVE_DIR, cold tracks stay hot. Compaction runs in the background and
+records how many bytes it freed in the hot directory.
+"""
+from filelock import FileLock, Timeout
+from datetime import datetime
+import threading
+import shutil
+import time
+import os
+
+from utils.catalog import MUSIC_DIR, catalog_lock, load_catalog, get_track, update_track, get_meta, update_meta
+from utils.hashing import file_sha256
+from utils.ingest import INCOMING_DIR
+
+# Should be on a different volume than MUSIC_DIR; archiving is off when unset
+ARCHIVE_DIR = os.getenv("MUSIC_ARCHIVE_DIR")
+DERIVATIVES_DIR = os.path.join(MUSIC_DIR, "derivatives")
+
+RETENTION_POLICY = {
+    "max_age_days": float(os.getenv("RETENTION_MAX_AGE_DAYS", "30")),
+    "max_tracks": int(os.getenv("RETENTION_MAX_TRACKS", "50")),
+    "max_hot_mb": float(os.getenv("RETENTION_MAX_HOT_MB", "500")),
+    "sample_max_age_days": float(os.getenv("RETENTION_SAMPLE_MAX_AGE_DAYS", "7")),
+}
+COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL_SECONDS", "3600"))
+
+_compaction_lock = FileLock(os.path.join(MUSIC_DIR, ".compaction.lock"))
+_restore_lock = threading.Lock()
+
+
+def _is_track(filename: str) -> bool:
+    return filename.endswith('.mp3') and '_sample_' not in filename
+
+
+def _archive_path(name: str) -> str:
+    return os.path.join(ARCHIVE_DIR, name)
+
+
+def track_hash(name: str) -> str:
+    """Content hash of a hot track, cached in the catalog by size and mtime"""
+    path = os.path.join(MUSIC_DIR, name)
+    stat = os.stat(path)
+    entry = get_track(name) or {}
+    if entry.get("sha256") and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+        return entry["sha256"]
+
+    digest = file_sha256(path)
+    update_track(name, sha256=digest, size=stat.st_size, mtime=stat.st_mtime, tier="hot")
+    return digest
+
+
+def archive_track(name: str) -> int:
+    """Move a hot track to the archive volume.
+
+    Returns:
+        Bytes freed in the hot directory (the track's size)
+    """
+    path = os.path.join(MUSIC_DIR, name)
+    dest = _archive_path(name)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    digest = track_hash(name)
+    size = os.path.getsize(path)
+    # Copy + rename rather than os.rename: the archive is usually another filesystem
+    tmp_path = f"{dest}.{os.getpid()}.part"
+    shutil.copyfile(path, tmp_path)
+    if os.path.getsize(tmp_path) != size:
+        os.remove(tmp_path)
+        raise IOError(f"Archive copy of {name} is incomplete")
+    os.replace(tmp_path, dest)
+
+    update_track(name, tier="archive", archive_path=dest, sha256=digest, size=size,
+                 archived_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    os.remove(path)
+    return size
+
+
+def restore_track(name: str) -> str:
+    """Copy an archived track back into the hot directory, verifying its hash"""
+    with _restore_lock:
+        path = os.path.join(MUSIC_DIR, name)
+        if os.path.exists(path):
+            return path
+
+        entry = get_track(name) or {}
+        source = entry.get("archive_path")
+        if not source or not os.path.exists(source):
+            raise FileNotFoundError(f"Track not found in hot or archive tier: {name}")
+
+        tmp_path = f"{path}.{os.getpid()}.part"
+        shutil.copyfile(source, tmp_path)
+
+        if entry.get("sha256") and file_sha256(tmp_path) != entry["sha256"]:
+            os.remove(tmp_path)
+            raise IOError(f"Archived copy of {name} failed verification")
+
+        # Keep the original mtime so listings stay in generation order
+        if entry.get("mtime"):
+            os.utime(tmp_path, (time.time(), entry["mtime"]))
+        os.replace(tmp_path, path)
+        os.remove(source)
+
+        update_track(name, tier="hot", archive_path=None, last_access=time.time())
+        print(f"Restored {name} from archive")
+        return path
+
+
+def resolve_track(music_file: str) -> str:
+    """Map a requested track path to a readable hot file.
+
+    Follows duplicate aliases and restores archived tracks on demand. Paths
+    outside generated_music/ (or unknown tracks) are returned unchanged.
+    """
+    if os.path.exists(music_file):
+        return music_file
+
+    name = os.path.basename(music_file)
+    entry = get_track(name)
+    if not entry:
+        return music_file
+
+    if entry.get("duplicate_of"):
+        return resolve_track(os.path.join(MUSIC_DIR, entry["duplicate_of"]))
+    if entry.get("tier") == "archive":
+        return restore_track(name)
+    return music_file
+
+
+def _deduplicate(names: list, metrics: dict) -> list:
+    """Remove byte-identical tracks, keeping one hot copy of each.
+
+    The kept copy is the oldest, except that the newest track always stays
+    (as in retention, so it never drops out of the latest-music listing).
+    Archived copies of content that is still hot become aliases of the hot copy.
+    """
+    by_hash = {}
+    for name in sorted(names, key=lambda n: os.path.getmtime(os.path.join(MUSIC_DIR, n))):
+        by_hash.setdefault(track_hash(name), []).append(name)
+
+    archived = {}
+    for name, entry in load_catalog()["tracks"].items():
+        if entry.get("tier") == "archive" and entry.get("sha256") in by_hash:
+            archived.setdefault(entry["sha256"], []).append((name, entry))
+
+    newest = max(names) if names else None  # names embed the generation timestamp
+    kept = []
+    for digest, group in by_hash.items():
+        original = newest if newest in group else group[0]
+        kept.append(original)
+        for duplicate in group:
+            if duplicate == original:
+                continue
+            path = os.path.join(MUSIC_DIR, duplicate)
+            metrics["hot_bytes_freed"] += os.path.getsize(path)
+            os.remove(path)
+            update_track(duplicate, tier="alias", duplicate_of=original, sha256=digest)
+            metrics["deduplicated"] += 1
+            print(f"Removed duplicate {duplicate} (same content as {original})")
+
+        for name, entry in archived.get(digest, []):
+            archive_path = entry.get("archive_path")
+            if archive_path and os.path.exists(archive_path):
+                os.remove(archive_path)
+            update_track(name, tier="alias", duplicate_of=original, sha256=digest, archive_path=None)
+            metrics["deduplicated"] += 1
+            print(f"Dropped archived copy {name} (same content as hot {original})")
+    return kept
+
+
+def _prune_samples(now: float, metrics: dict):
+    """Delete stale preview copies (they can always be re-rendered) and abandoned downloads"""
+    max_age = RETENTION_POLICY["sample_max_age_days"] * 86400
+    candidates = [os.path.join(MUSIC_DIR, f) for f in os.listdir(MUSIC_DIR) if '_sample_' in f]
+    if os.path.exists(DERIVATIVES_DIR):
+        candidates += [os.path.join(DERIVATIVES_DIR, f) for f in os.listdir(DERIVATIVES_DIR)]
+    for root, _, files in os.walk(INCOMING_DIR):
+        candidates += [os.path.join(root, f) for f in files]
+
+    for path in candidates:
+        if path.endswith('.part'):
+            continue
+        stat = os.stat(path)
+        if now - stat.st_atime > max_age and now - stat.st_mtime > max_age:
+            os.remove(path)
+            metrics["hot_bytes_freed"] += stat.st_size
+            metrics["samples_deleted"] += 1
+
+
+def _apply_retention(names: list, now: float, metrics: dict):
+    """Archive tracks outside the age/count/size budget, newest tracks stay hot"""
+    if not ARCHIVE_DIR:
+        return  # no archive volume configured: moving files on the same disk frees nothing
+    tracks = load_catalog()["tracks"]
+
+    def last_used(name):
+        mtime = os.path.getmtime(os.path.join(MUSIC_DIR, name))
+        return max(mtime, tracks.get(name, {}).get("last_access") or 0)
+
+    max_age = RETENTION_POLICY["max_age_days"] * 86400
+    max_bytes = RETENTION_POLICY["max_hot_mb"] * 1024 * 1024
+    newest = max(names) if names else None  # names embed the generation timestamp
+    hot_bytes = 0
+
+    for index, name in enumerate(sorted(names, key=last_used, reverse=True)):
+        size = os.path.getsize(os.path.join(MUSIC_DIR, name))
+        within_policy = (
+            index < RETENTION_POLICY["max_tracks"]
+            and now - last_used(name) <= max_age
+            and hot_bytes + size <= max_bytes
+        )
+        # Always keep the newest track hot for the marketing agent
+        if name == newest or within_policy:
+            hot_bytes += size
+            continue
+
+        metrics["hot_bytes_freed"] += archive_track(name)
+        metrics["archived"] += 1
+        print(f"Archived {name}")
+
+
+def run_compaction() -> dict:
+    """Run one compaction pass over generated_music/ and record its metrics.
+
+    Returns:
+        Metrics for this pass, or {"skipped": True} if another process is compacting
+    """
+    if not os.path.exists(MUSIC_DIR):
+        return {"skipped": True}
+
+    try:
+        _compaction_lock.acquire(timeout=0)
+    except Timeout:
+        return {"skipped": True}
+
+    started = time.time()
+    metrics = {"hot_bytes_freed": 0, "deduplicated": 0, "archived": 0, "samples_deleted": 0}
+    try:
+        # Ingest creates and registers each track under this lock, so no half-ingested file is listed
+        with catalog_lock():
+            names = [f for f in os.listdir(MUSIC_DIR) if _is_track(f)]
+        names = _deduplicate(names, metrics)
+        _prune_samples(started, metrics)
+        _apply_retention(names, started, metrics)
+    finally:
+        _compaction_lock.release()
+
+    metrics["duration_ms"] = round((time.time() - started) * 1000, 1)
+    metrics["finished_at"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    _record_metrics(metrics)
+
+    print(f"Compaction done: {metrics['hot_bytes_freed'] / 1024:.1f} KB freed in {MUSIC_DIR}, "
+          f"{metrics['archived']} archived, {metrics['deduplicated']} duplicates removed")
+    return metrics
+
+
+def _record_metrics(metrics: dict):
+    totals = get_meta("storage") or {}
+    update_meta("storage", runs=totals.get("runs", 0) + 1,
+                hot_bytes_freed=totals.get("hot_bytes_freed", 0) + metrics["hot_bytes_freed"],
+                last_run=metrics)
+
+
+def storage_stats() -> dict:
+    """Current tier sizes plus compaction metrics"""
+    hot_bytes = hot_count = 0
+    if os.path.exists(MUSIC_DIR):
+        for entry in os.scandir(MUSIC_DIR):
+            if entry.is_file() and entry.name.endswith('.mp3'):
+                hot_bytes += entry.stat().st_size
+                hot_count += 1
+
+    archive_bytes = archive_count = 0
+    if ARCHIVE_DIR and os.path.exists(ARCHIVE_DIR):
+        for entry in os.scandir(ARCHIVE_DIR):
+            if entry.name.endswith('.mp3'):
+                archive_bytes += entry.stat().st_size
+                archive_count += 1
+
+    return {
+        "hot": {"files": hot_count, "bytes": hot_bytes},
+        "archive": {"dir": ARCHIVE_DIR, "files": archive_count, "bytes": archive_bytes},
+        "policy": RETENTION_POLICY,
+        "compaction": get_meta("storage") or {"runs": 0, "hot_bytes_freed": 0},
+    }
+
+
+def start_compaction_thread(interval: int = COMPACTION_INTERVAL) -> threading.Thread:
+    """Run compaction periodically in a daemon thread"""
+    def loop():
+        while True:
+            try:
+                run_compaction()
+            except Exception as e:
+                print(f"Compaction error: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="storage-compaction", daemon=True)
+    thread.start()
+    return thread
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Result cache for read-only agent tools.
+
+Tools declare in their metadata whether they only read or also write, and
+which resources (customers, music, ...) they touch. Read-only results are
+memoized for the current request; a write tool drops every cached result for
+the resources it writes. An optional process-wide cache (TOOL_CACHE_TTL
+seconds, off by default) also shares results across requests. Writes made by
+other processes (e.g. the scheduler) are only picked up when that TTL runs out.
+"""
+from contextlib import contextmanager
+import contextvars
+import threading
+import json
+import time
+import os
+
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "0"))
+
+
+def read_only(*resources):
+    """Mark a tool as side-effect free; its result depends on `resources`"""
+    def mark(tool):
+        tool.metadata = {**(tool.metadata or {}), "read_only": True, "resources": list(resources)}
+        return tool
+    return mark
+
+
+def writes(*resources):
+    """Mark a tool as changing `resources`, invalidating cached reads of them"""
+    def mark(tool):
+        tool.metadata = {**(tool.metadata or {}), "read_only": False, "resources": list(resources)}
+        return tool
+    return mark
+
+
+class ToolCache:
+    """Tool results keyed by (tool, input), with optional expiry"""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (result, resources, stored_at)
+        self.generation = 0  # bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result, resources, generation: int):
+        """Store a result read at `generation`, unless a write happened since"""
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = (result, set(resources), time.monotonic())
+
+    def invalidate(self, resources=None):
+        """Drop results depending on any of `resources` (everything if None)"""
+        with self._lock:
+            self.generation += 1
+            if resources is None:
+                self._entries.clear()
+                return
+            resources = set(resources)
+            self._entries = {k: v for k, v in self._entries.items() if not v[1] & resources}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_shared = ToolCache(TOOL_CACHE_TTL) if TOOL_CACHE_TTL > 0 else None
+_current = contextvars.ContextVar("tool_cache", default=None)
+
+
+@contextmanager
+def request_cache_scope():
+    """Give the block its own request-scoped cache (keeps an enclosing one)"""
+    if _current.get() is not None:
+        yield _current.get()
+        return
+    token = _current.set(ToolCache())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def _caches():
+    return [cache for cache in (_current.get(), _shared) if cache is not None]
+
+
+def invalidate(resources=None):
+    """Forget cached reads of `resources` after a write (everything if None)"""
+    for cache in _caches():
+        cache.invalidate(resources)
+
+
+def invoke_tool(tool, tool_input):
+    """Invoke a tool, serving read-only tools from cache and invalidating on writes.
+
+    Tools without read/write metadata are never cached and, to be safe, are
+    treated as writes to everything.
+    """
+    metadata = tool.metadata or {}
+    if "read_only" not in metadata:
+        try:
+            return tool.invoke(tool_input)
+        finally:
+            invalidate()
+
+    resources = metadata["resources"]
+    if not metadata["read_only"]:
+        try:
+            return tool.invoke(tool_input)
+        finally:
+            # Also after a failure: the write may have happened partially
+            invalidate(resources)
+
+    key = (tool.name, json.dumps(tool_input, sort_keys=True, default=str))
+    caches = _caches()
+    for cache in caches:
+        result = cache.get(key)
+        if result is not None:
+            print(f"Cache hit: {tool.name}")
+            return result
+
+    generations = [cache.generation for cache in caches]
+    result = tool.invoke(tool_input)
+    for cache, generation in zip(caches, generations):
+        cache.put(key, result, resources, generation)
+    return result
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the process-wide cache (None when disabled)"""
+    return _shared.stats() if _shared is not None else None
\ No newline at end of file